@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Usuario, Libro, Prestamo, Reserva
+from .models import Usuario, Libro, Prestamo, PrestamoHistorico, Reserva, Recordatorio, EventoAuditoria
 from django.contrib.auth.admin import UserAdmin
 
 @admin.register(Usuario)
@@ -11,4 +11,23 @@ class UsuarioAdmin(UserAdmin):
 
 admin.site.register(Libro)
 admin.site.register(Prestamo)
+admin.site.register(PrestamoHistorico)
 admin.site.register(Reserva)
+admin.site.register(Recordatorio)
+
+@admin.register(EventoAuditoria)
+class EventoAuditoriaAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'accion', 'actor', 'usuario', 'libro', 'codigo_pago', 'monto')
+    list_filter = ('accion', 'fecha')
+    search_fields = ('codigo_pago', 'detalle')
+    date_hierarchy = 'fecha'
+
+    # Registro de solo lectura
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BibliotecaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'biblioteca'
+
+    def ready(self):
+        # Registra las señales que mantienen el índice de autocompletado
+        from . import autocompletar  # noqa: F401
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Value
+from django.utils import timezone
+
+from .models import Prestamo, PrestamoHistorico
+
+
+# ---------------------------------------
+# Archivado de préstamos devueltos
+# ---------------------------------------
+def archivar_prestamos(dias=None, lote=None):
+    """Mueve a PrestamoHistorico los préstamos devueltos cuya fecha de
+    devolución tenga más de `dias` días, en transacciones de `lote` filas.
+    Devuelve la cantidad de préstamos archivados."""
+    if dias is None:
+        dias = settings.PRESTAMOS_ARCHIVO_DIAS
+    if lote is None:
+        lote = settings.PRESTAMOS_ARCHIVO_LOTE
+
+    limite = timezone.now().date() - timedelta(days=dias)
+    pendientes = Prestamo.objects.filter(devuelto=True, fecha_devolucion__lt=limite).order_by('id')
+
+    total = 0
+    while True:
+        # Cada lote es atómico: o queda en el histórico o sigue en Prestamo
+        with transaction.atomic():
+            prestamos = list(pendientes.select_for_update()[:lote])
+            if not prestamos:
+                break
+            PrestamoHistorico.objects.bulk_create([
+                PrestamoHistorico(
+                    prestamo_original=p.id,
+                    usuario_id=p.usuario_id,
+                    libro_id=p.libro_id,
+                    fecha_prestamo=p.fecha_prestamo,
+                    fecha_devolucion=p.fecha_devolucion,
+                    renovado=p.renovado,
+                    multa_generada=p.multa_generada,
+                )
+                for p in prestamos
+            ])
+            Prestamo.objects.filter(id__in=[p.id for p in prestamos]).delete()
+        total += len(prestamos)
+
+    return total
+
+
+# ---------------------------------------
+# Consulta de préstamos (activos + historial)
+# ---------------------------------------
+def prestamos(historial=False, pagina=1, **filtros):
+    """Préstamos que cumplen `filtros`. Sin `historial` solo se consulta la
+    tabla Prestamo. Con `historial` se le suman los préstamos archivados y se
+    devuelve una página (Paginator) de PRESTAMOS_HISTORIAL_POR_PAGINA
+    préstamos, del más reciente al más viejo: la base de datos une, ordena y
+    recorta con UNION ALL ... ORDER BY ... LIMIT, y solo se cargan completos
+    los préstamos de la página pedida."""
+    activos = Prestamo.objects.filter(**filtros)
+    if not historial:
+        return activos.select_related('usuario', 'libro')
+
+    archivados = PrestamoHistorico.objects.filter(**filtros)
+    claves = (
+        activos.annotate(es_archivado=Value(False)).values_list('id', 'es_archivado', 'fecha_prestamo')
+        .union(
+            archivados.annotate(es_archivado=Value(True)).values_list('id', 'es_archivado', 'fecha_prestamo'),
+            all=True,
+        )
+        .order_by('-fecha_prestamo', '-id')
+    )
+    pagina = Paginator(claves, settings.PRESTAMOS_HISTORIAL_POR_PAGINA).get_page(pagina)
+
+    ids = {False: [], True: []}
+    for id_, es_archivado, _ in pagina.object_list:
+        ids[es_archivado].append(id_)
+    cargados = {
+        False: activos.select_related('usuario', 'libro').in_bulk(ids[False]),
+        True: archivados.select_related('usuario', 'libro').in_bulk(ids[True]),
+    }
+    pagina.object_list = [cargados[es_archivado][id_] for id_, es_archivado, _ in pagina.object_list]
+    return pagina
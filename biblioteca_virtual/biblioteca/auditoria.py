@@ -0,0 +1,125 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import EventoAuditoria
+
+
+# Eventos pendientes de este proceso (se escriben en diferido)
+_pendientes = []
+_lock = threading.Lock()
+_ultimo_volcado = time.monotonic()
+_temporizador = None
+_en_falla = False  # el último volcado falló: solo se reintenta por tiempo
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------
+# Registro de eventos
+# ---------------------------------------
+def registrar(accion, actor=None, usuario=None, libro=None, prestamo=None, reserva=None,
+              codigo_pago='', monto=None, detalle=''):
+    """Agrega un evento de auditoría al buffer del proceso. No toca la base
+    de datos salvo que el buffer alcance AUDITORIA_LOTE eventos o hayan
+    pasado AUDITORIA_INTERVALO segundos desde la última escritura. Si el
+    último volcado falló no escribe nunca: los reintentos quedan a cargo del
+    temporizador y del middleware, una vez por intervalo."""
+    evento = EventoAuditoria(
+        fecha=timezone.now(),
+        accion=accion,
+        actor_id=getattr(actor, 'pk', None),
+        usuario_id=getattr(usuario, 'pk', None),
+        libro_id=getattr(libro, 'pk', None),
+        id_prestamo=getattr(prestamo, 'pk', None),
+        id_reserva=getattr(reserva, 'pk', None),
+        codigo_pago=codigo_pago,
+        monto=monto,
+        detalle=detalle[:255],
+    )
+    with _lock:
+        _pendientes.append(evento)
+        _recortar()
+        _iniciar_temporizador()
+        lleno = len(_pendientes) >= settings.AUDITORIA_LOTE
+    if _en_falla:
+        return
+    if lleno:
+        volcar()
+    else:
+        volcar_si_vencido()
+
+
+def volcar():
+    """Escribe con un solo bulk_create todos los eventos pendientes. Se
+    llama después de que la operación auditada ya se guardó, así que un
+    error aquí no debe hacer fallar el request: se registra en el log y los
+    eventos quedan en el buffer para el próximo intento."""
+    global _ultimo_volcado, _en_falla
+    with _lock:
+        eventos = _pendientes[:]
+        _pendientes.clear()
+        _ultimo_volcado = time.monotonic()
+    if not eventos:
+        return
+    try:
+        EventoAuditoria.objects.bulk_create(eventos)
+    except Exception:
+        logger.exception("No se pudieron escribir %d eventos de auditoría; se reintentará", len(eventos))
+        with _lock:
+            _pendientes[:0] = eventos
+            _recortar()
+            _en_falla = True
+    else:
+        _en_falla = False
+
+
+def _recortar():
+    """Mientras la base no responde el buffer no crece sin límite: pasado
+    AUDITORIA_MAX_PENDIENTES se descartan los eventos más viejos, dejando
+    constancia en el log. Se llama con _lock tomado."""
+    sobrantes = len(_pendientes) - settings.AUDITORIA_MAX_PENDIENTES
+    if sobrantes > 0:
+        descartados = _pendientes[:sobrantes]
+        del _pendientes[:sobrantes]
+        logger.error(
+            "Buffer de auditoría lleno: se descartan %d eventos (desde %s hasta %s)",
+            sobrantes, descartados[0].fecha.isoformat(), descartados[-1].fecha.isoformat(),
+        )
+
+
+def volcar_si_vencido():
+    """Vuelca los pendientes si pasó el intervalo máximo de espera. Se llama
+    desde el hilo temporizador y al terminar cada request (AuditoriaMiddleware)."""
+    intervalo = settings.AUDITORIA_INTERVALO
+    if _pendientes and time.monotonic() - _ultimo_volcado >= intervalo:
+        volcar()
+
+
+def _esperar_y_volcar():
+    intervalo = settings.AUDITORIA_INTERVALO
+    while True:
+        time.sleep(intervalo)
+        if _pendientes:
+            volcar_si_vencido()
+            # La conexión de este hilo no se reutiliza hasta el próximo volcado
+            connections.close_all()
+
+
+def _iniciar_temporizador():
+    """Hilo que vuelca los pendientes aunque el proceso no reciba más
+    requests. Se inicia con el primer evento (y de nuevo tras un fork,
+    donde el hilo del padre no existe). Se llama con _lock tomado."""
+    global _temporizador
+    if _temporizador is None or not _temporizador.is_alive():
+        _temporizador = threading.Thread(target=_esperar_y_volcar, name='auditoria', daemon=True)
+        _temporizador.start()
+
+
+# Lo que quede en memoria se escribe al apagar el proceso
+atexit.register(volcar)
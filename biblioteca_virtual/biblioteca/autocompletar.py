@@ -0,0 +1,170 @@
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Libro
+
+MIN_LARGO_PALABRA = 3
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Cien Años' -> 'cien anos'."""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).casefold().strip()
+
+
+def _claves(titulo, autor):
+    """Claves por las que se encuentra un libro: título y autor completos y
+    cada sufijo que empieza en una palabra ('soledad' encuentra 'Cien años
+    de soledad'). Las palabras cortas se omiten para acotar la memoria."""
+    claves = set()
+    for texto in (normalizar(titulo), normalizar(autor)):
+        palabras = texto.split()
+        for i, palabra in enumerate(palabras):
+            if i == 0 or len(palabra) >= MIN_LARGO_PALABRA:
+                claves.add(' '.join(palabras[i:]))
+    return claves
+
+
+# ---------------------------------------
+# Índice de prefijos en memoria
+# ---------------------------------------
+class IndicePrefijos:
+    """Arreglo ordenado de (clave, libro_id) consultado con bisect. Se construye
+    al arrancar el servidor (ver wsgi.py/asgi.py) y se mantiene al día con las
+    señales de Libro; cada AUTOCOMPLETAR_TTL segundos se reconstruye en un
+    hilo aparte para recoger los cambios hechos desde otros procesos, mientras
+    los requests siguen usando los arreglos anteriores."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = []  # [(clave, libro_id)] ordenado
+        self._libros = {}  # libro_id -> (titulo, autor, disponible)
+        self._construido = None
+        self._hilo = None  # reconstrucción en curso
+        self._cambios = None  # señales recibidas durante la reconstrucción
+
+    def construir(self):
+        with self._lock:
+            self._cambios = []
+        try:
+            # Se leen todas las filas antes de indexar para no retener la
+            # lectura (y con SQLite el bloqueo de la tabla) mientras tanto
+            filas = list(Libro.objects.values_list('id', 'titulo', 'autor', 'disponible'))
+            libros = {}
+            entradas = []
+            for libro_id, titulo, autor, disponible in filas:
+                libros[libro_id] = (titulo, autor, disponible)
+                entradas.extend((clave, libro_id) for clave in _claves(titulo, autor))
+            entradas.sort()
+        except Exception:
+            with self._lock:
+                self._cambios = None
+            raise
+        with self._lock:
+            cambios, self._cambios = self._cambios, None
+            self._entradas = entradas
+            self._libros = libros
+            self._construido = time.monotonic()
+            # La lectura pudo no ver lo guardado mientras se construía
+            for libro_id, datos in cambios:
+                self._quitar(libro_id)
+                if datos is not None:
+                    self._agregar(libro_id, *datos)
+
+    def reconstruir_en_segundo_plano(self):
+        """Lanza construir() en un hilo si no hay otra reconstrucción en
+        curso en este proceso y devuelve el hilo."""
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._reconstruir, name='autocompletar', daemon=True)
+                self._hilo.start()
+            return self._hilo
+
+    def _reconstruir(self):
+        try:
+            self.construir()
+        finally:
+            connections.close_all()
+
+    def _vigente(self):
+        ttl = settings.AUTOCOMPLETAR_TTL
+        return self._construido is not None and time.monotonic() - self._construido < ttl
+
+    def actualizar(self, libro):
+        with self._lock:
+            if self._cambios is not None:
+                self._cambios.append((libro.pk, (libro.titulo, libro.autor, libro.disponible)))
+            if self._construido is None:
+                return  # se indexará al construir
+            self._quitar(libro.pk)
+            self._agregar(libro.pk, libro.titulo, libro.autor, libro.disponible)
+
+    def eliminar(self, libro_id):
+        with self._lock:
+            if self._cambios is not None:
+                self._cambios.append((libro_id, None))
+            if self._construido is not None:
+                self._quitar(libro_id)
+
+    def _agregar(self, libro_id, titulo, autor, disponible):
+        self._libros[libro_id] = (titulo, autor, disponible)
+        for clave in _claves(titulo, autor):
+            insort(self._entradas, (clave, libro_id))
+
+    def _quitar(self, libro_id):
+        anterior = self._libros.pop(libro_id, None)
+        if anterior is None:
+            return
+        for clave in _claves(anterior[0], anterior[1]):
+            i = bisect_left(self._entradas, (clave, libro_id))
+            if i < len(self._entradas) and self._entradas[i] == (clave, libro_id):
+                del self._entradas[i]
+
+    def sugerencias(self, texto, limite=None):
+        """Hasta `limite` libros cuyo título o autor (o una de sus palabras)
+        empieza con `texto`, ordenados alfabéticamente por la clave."""
+        if limite is None:
+            limite = settings.AUTOCOMPLETAR_LIMITE
+        prefijo = normalizar(texto)
+        if not prefijo:
+            return []
+        if self._construido is None:
+            # Solo si llega un request antes de terminar la carga inicial
+            self.reconstruir_en_segundo_plano().join()
+        elif not self._vigente():
+            self.reconstruir_en_segundo_plano()
+
+        resultados = []
+        vistos = set()
+        with self._lock:
+            i = bisect_left(self._entradas, (prefijo,))
+            while i < len(self._entradas) and len(resultados) < limite:
+                clave, libro_id = self._entradas[i]
+                if not clave.startswith(prefijo):
+                    break
+                if libro_id not in vistos:
+                    vistos.add(libro_id)
+                    titulo, autor, disponible = self._libros[libro_id]
+                    resultados.append({'id': libro_id, 'titulo': titulo, 'autor': autor, 'disponible': disponible})
+                i += 1
+        return resultados
+
+
+indice = IndicePrefijos()
+
+
+@receiver(post_save, sender=Libro)
+def _libro_guardado(sender, instance, **kwargs):
+    indice.actualizar(instance)
+
+
+@receiver(post_delete, sender=Libro)
+def _libro_eliminado(sender, instance, **kwargs):
+    indice.eliminar(instance.pk)
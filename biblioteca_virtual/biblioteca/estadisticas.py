@@ -0,0 +1,203 @@
+from collections import Counter
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import (
+    Configuracion, Prestamo, PrestamoHistorico, Reserva,
+    ResumenMoraDia, ResumenPrestamosDia, ResumenReservasDia, Usuario,
+)
+
+# Marcas de agua guardadas en Configuracion: último id ya agregado y mayor id
+# visto en la ejecución anterior (ver _rango)
+MARCA_PRESTAMOS = 'estadisticas_ultimo_prestamo'
+MARCA_RESERVAS = 'estadisticas_ultima_reserva'
+TOPE_PRESTAMOS = 'estadisticas_tope_prestamo'
+TOPE_RESERVAS = 'estadisticas_tope_reserva'
+
+
+def _acumular(modelo, campos, grupos):
+    """Suma las cantidades de `grupos` ({(fecha, ...): cantidad}) a las filas
+    de `modelo` identificadas por `campos`, creando las que falten."""
+    if not grupos:
+        return
+    fechas = [clave[0] for clave in grupos]
+    existentes = {
+        tuple(getattr(fila, campo) for campo in campos): fila
+        for fila in modelo.objects.filter(fecha__range=(min(fechas), max(fechas)))
+    }
+    nuevas, cambiadas = [], []
+    for clave, cantidad in grupos.items():
+        fila = existentes.get(clave)
+        if fila:
+            fila.cantidad += cantidad
+            cambiadas.append(fila)
+        else:
+            nuevas.append(modelo(cantidad=cantidad, **dict(zip(campos, clave))))
+    modelo.objects.bulk_update(cambiadas, ['cantidad'], batch_size=500)
+    modelo.objects.bulk_create(nuevas, batch_size=500)
+
+
+# ---------------------------------------
+# Agregación incremental
+# ---------------------------------------
+def _rango(marca, tope, maximo):
+    """Ids (desde, hasta] a agregar en esta ejecución. Solo se llega hasta el
+    mayor id visto en la ejecución anterior y no hasta `maximo`: en PostgreSQL
+    un id se asigna al insertar y no al confirmar, así que una transacción
+    abierta puede aparecer después con un id menor que `maximo`, y la marca
+    ya la habría dejado atrás para siempre. Sin ejecución anterior (primera
+    vez o --reconstruir) se agrega todo hasta `maximo`."""
+    desde = int(Configuracion.obtener(marca, 0))
+    anterior = Configuracion.obtener(tope)
+    Configuracion.guardar(tope, maximo)
+    return desde, maximo if anterior is None else min(int(anterior), maximo)
+
+
+def _agregar_prestamos():
+    """Préstamos con id posterior a la marca, estén activos o ya archivados."""
+    desde, hasta = _rango(MARCA_PRESTAMOS, TOPE_PRESTAMOS, max(
+        Prestamo.objects.aggregate(m=Max('id'))['m'] or 0,
+        PrestamoHistorico.objects.aggregate(m=Max('prestamo_original'))['m'] or 0,
+    ))
+    if hasta <= desde:
+        return 0
+
+    grupos = Counter()
+    for modelo, campo_id in ((Prestamo, 'id'), (PrestamoHistorico, 'prestamo_original')):
+        filas = (
+            modelo.objects
+            .filter(**{f'{campo_id}__gt': desde, f'{campo_id}__lte': hasta})
+            .values('fecha_prestamo', 'libro_id', 'usuario__rol')
+            .annotate(n=Count('id'))
+            .values_list('fecha_prestamo', 'libro_id', 'usuario__rol', 'n')
+        )
+        for fecha, libro_id, rol, n in filas:
+            grupos[(fecha, libro_id, rol)] += n
+
+    _acumular(ResumenPrestamosDia, ('fecha', 'libro_id', 'rol'), grupos)
+    Configuracion.guardar(MARCA_PRESTAMOS, hasta)
+    return sum(grupos.values())
+
+
+def _agregar_reservas():
+    desde, hasta = _rango(MARCA_RESERVAS, TOPE_RESERVAS, Reserva.objects.aggregate(m=Max('id'))['m'] or 0)
+    if hasta <= desde:
+        return 0
+
+    filas = (
+        Reserva.objects
+        .filter(id__gt=desde, id__lte=hasta)
+        .values('fecha_reserva', 'libro_id')
+        .annotate(n=Count('id'))
+        .values_list('fecha_reserva', 'libro_id', 'n')
+    )
+    grupos = Counter({(fecha, libro_id): n for fecha, libro_id, n in filas})
+
+    _acumular(ResumenReservasDia, ('fecha', 'libro_id'), grupos)
+    Configuracion.guardar(MARCA_RESERVAS, hasta)
+    return sum(grupos.values())
+
+
+def _foto_mora(hoy):
+    """Préstamos activos y vencidos por rol al día de hoy. Solo recorre la
+    tabla de préstamos activos, así que no depende del historial. Se guarda
+    una fila por cada rol, aunque sea en cero, para que una foto anterior
+    del mismo día no quede desactualizada."""
+    filas = {
+        fila['usuario__rol']: fila
+        for fila in (
+            Prestamo.objects
+            .filter(devuelto=False)
+            .values('usuario__rol')
+            .annotate(activos=Count('id'), vencidos=Count('id', filter=Q(fecha_devolucion__lt=hoy)))
+        )
+    }
+    for rol, _ in Usuario.ROLES:
+        fila = filas.get(rol, {})
+        ResumenMoraDia.objects.update_or_create(
+            fecha=hoy, rol=rol,
+            defaults={'activos': fila.get('activos', 0), 'vencidos': fila.get('vencidos', 0)},
+        )
+
+
+def actualizar_estadisticas(reconstruir=False):
+    """Agrega a los resúmenes diarios los préstamos y reservas nuevos hasta
+    la ejecución anterior (ver _rango) y guarda la foto de mora del día. Con `reconstruir`
+    se vacían los resúmenes y se recalculan desde el primer registro (la
+    foto de mora no se puede reconstruir hacia atrás y se conserva).
+    Devuelve (préstamos, reservas) agregados."""
+    with transaction.atomic():
+        if reconstruir:
+            ResumenPrestamosDia.objects.all().delete()
+            ResumenReservasDia.objects.all().delete()
+            Configuracion.objects.filter(
+                nombre__in=[MARCA_PRESTAMOS, MARCA_RESERVAS, TOPE_PRESTAMOS, TOPE_RESERVAS]
+            ).delete()
+        prestamos = _agregar_prestamos()
+        reservas = _agregar_reservas()
+        _foto_mora(timezone.now().date())
+    return prestamos, reservas
+
+
+# ---------------------------------------
+# Datos para el panel de administración
+# ---------------------------------------
+def _con_porcentaje(filas):
+    """Agrega a cada fila el ancho de su barra relativo al máximo."""
+    maximo = max((fila['total'] for fila in filas), default=0)
+    for fila in filas:
+        fila['porcentaje'] = round(100 * fila['total'] / maximo) if maximo else 0
+    return filas
+
+
+def resumen_panel(meses=12, top=10):
+    """Tendencias del panel leídas solo de las tablas de resumen."""
+    hoy = timezone.now().date()
+    anio, mes = hoy.year, hoy.month - (meses - 1)
+    while mes <= 0:
+        mes += 12
+        anio -= 1
+    desde = date(anio, mes, 1)
+
+    por_mes = dict(
+        ResumenPrestamosDia.objects
+        .filter(fecha__gte=desde)
+        .annotate(mes=TruncMonth('fecha'))
+        .values('mes')
+        .annotate(total=Sum('cantidad'))
+        .values_list('mes', 'total')
+    )
+    prestamos_por_mes = []
+    for _ in range(meses):
+        prestamos_por_mes.append({'mes': date(anio, mes, 1), 'total': por_mes.get(date(anio, mes, 1), 0)})
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+    libros_mas_prestados = list(
+        ResumenPrestamosDia.objects
+        .filter(fecha__gte=desde)
+        .values('libro__titulo', 'libro__autor')
+        .annotate(total=Sum('cantidad'))
+        .order_by('-total')[:top]
+    )
+    reservas_por_libro = list(
+        ResumenReservasDia.objects
+        .filter(fecha__gte=desde)
+        .values('libro__titulo', 'libro__autor')
+        .annotate(total=Sum('cantidad'))
+        .order_by('-total')[:top]
+    )
+
+    ultima_foto = ResumenMoraDia.objects.aggregate(m=Max('fecha'))['m']
+    mora_por_rol = ResumenMoraDia.objects.filter(fecha=ultima_foto).order_by('rol') if ultima_foto else []
+
+    return {
+        'prestamos_por_mes': _con_porcentaje(prestamos_por_mes),
+        'libros_mas_prestados': _con_porcentaje(libros_mas_prestados),
+        'reservas_por_libro': _con_porcentaje(reservas_por_libro),
+        'mora_por_rol': mora_por_rol,
+        'fecha_mora': ultima_foto,
+    }
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca.estadisticas import actualizar_estadisticas
+
+
+class Command(BaseCommand):
+    help = (
+        "Actualiza los resúmenes diarios de préstamos, reservas y mora para el panel. "
+        "Préstamos y reservas se agregan hasta el mayor id visto en la ejecución anterior, "
+        "así que lo registrado después aparece en la siguiente ejecución"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconstruir', action='store_true',
+                            help="Vacía los resúmenes y los recalcula desde el primer préstamo")
+
+    def handle(self, *args, **options):
+        prestamos, reservas = actualizar_estadisticas(reconstruir=options['reconstruir'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Estadísticas actualizadas: {prestamos} préstamos y {reservas} reservas nuevos"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca.archivo import archivar_prestamos
+
+
+class Command(BaseCommand):
+    help = "Mueve los préstamos devueltos antiguos a la tabla de históricos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None,
+                            help="Antigüedad mínima (días desde la devolución). Por defecto PRESTAMOS_ARCHIVO_DIAS")
+        parser.add_argument('--lote', type=int, default=None,
+                            help="Préstamos por transacción. Por defecto PRESTAMOS_ARCHIVO_LOTE")
+
+    def handle(self, *args, **options):
+        total = archivar_prestamos(dias=options['dias'], lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{total} préstamos archivados"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca.recomendaciones import calcular_recomendaciones
+
+
+class Command(BaseCommand):
+    help = "Calcula los libros similares a cada libro a partir del historial de préstamos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true',
+                            help="Recalcula todos los libros en lugar de solo los afectados por préstamos nuevos "
+                                 "(se hace solo si se borró algún préstamo)")
+
+    def handle(self, *args, **options):
+        libros, filas = calcular_recomendaciones(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(f"{libros} libros actualizados ({filas} recomendaciones)"))
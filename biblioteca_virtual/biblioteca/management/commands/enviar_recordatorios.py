@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca.recordatorios import enviar_recordatorios
+
+
+class Command(BaseCommand):
+    help = "Envía por correo un resumen de préstamos por vencer y vencidos a cada usuario"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None,
+                            help="Avisar préstamos que vencen dentro de estos días. Por defecto RECORDATORIOS_DIAS")
+        parser.add_argument('--lote', type=int, default=None,
+                            help="Correos por lote de envío. Por defecto RECORDATORIOS_LOTE")
+        parser.add_argument('--simular', action='store_true',
+                            help="Arma los correos sin enviarlos ni registrarlos")
+
+    def handle(self, *args, **options):
+        correos, prestamos, fallidos = enviar_recordatorios(
+            dias=options['dias'], lote=options['lote'], simular=options['simular'],
+        )
+        accion = "se enviarían" if options['simular'] else "enviados"
+        self.stdout.write(self.style.SUCCESS(f"{correos} correos {accion} ({prestamos} préstamos)"))
+        if fallidos:
+            self.stdout.write(self.style.WARNING(
+                f"{fallidos} correos no se pudieron enviar (ver el log); se reintentarán en la próxima ejecución"
+            ))
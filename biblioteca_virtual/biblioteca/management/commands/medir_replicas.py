@@ -0,0 +1,80 @@
+import multiprocessing
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Count
+
+from biblioteca.models import Configuracion, Libro, Prestamo, Usuario
+
+NOMBRE_PRUEBA = 'medir_replicas'
+
+
+class Command(BaseCommand):
+    help = ("Mide la latencia de escritura en la primaria mientras otros procesos hacen "
+            "las lecturas de los paneles, primero contra la primaria y luego contra cada réplica")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lectores', type=int, default=4, help="Procesos de lectura concurrentes")
+        parser.add_argument('--escrituras', type=int, default=200, help="Escrituras a medir por destino")
+
+    def handle(self, *args, **options):
+        destinos = ['default'] + list(settings.REPLICAS)
+        if len(destinos) == 1:
+            self.stdout.write(self.style.WARNING(
+                "No hay réplicas configuradas (BIBLIOTECA_REPLICAS); solo se mide la primaria."
+            ))
+
+        self.stdout.write(f"{'lecturas en':<12} {'p50 ms':>8} {'p95 ms':>8} {'máx ms':>8} {'lecturas/s':>11}")
+        for destino in destinos:
+            latencias, lecturas_por_segundo = self._medir(destino, options['lectores'], options['escrituras'])
+            cuantiles = statistics.quantiles(latencias, n=20)
+            self.stdout.write(
+                f"{destino:<12} {statistics.median(latencias) * 1000:>8.2f} {cuantiles[18] * 1000:>8.2f} "
+                f"{max(latencias) * 1000:>8.2f} {lecturas_por_segundo:>11.1f}"
+            )
+
+    @staticmethod
+    def _leer(destino, detener, contador):
+        # Las mismas consultas que dashboard_bibliotecario y el panel de administración.
+        # Se usan procesos y no hilos para que el GIL no distorsione la medición.
+        while not detener.is_set():
+            list(Prestamo.objects.using(destino).select_related('usuario', 'libro')[:500])
+            list(Usuario.objects.using(destino).values('rol').annotate(n=Count('id')))
+            Libro.objects.using(destino).filter(disponible=True).count()
+            with contador.get_lock():
+                contador.value += 1
+
+    def _medir(self, destino, lectores, escrituras):
+        # Cada proceso hijo debe abrir sus propias conexiones
+        connections.close_all()
+        contexto = multiprocessing.get_context('fork')
+        detener = contexto.Event()
+        contador = contexto.Value('i', 0)
+        procesos = [
+            contexto.Process(target=self._leer, args=(destino, detener, contador))
+            for _ in range(lectores)
+        ]
+        for proceso in procesos:
+            proceso.start()
+        time.sleep(0.5)  # dejar que los lectores arranquen
+        contador.value = 0
+
+        inicio = time.perf_counter()
+        latencias = []
+        try:
+            for i in range(escrituras):
+                t = time.perf_counter()
+                with transaction.atomic():
+                    Configuracion.objects.create(nombre=NOMBRE_PRUEBA, valor=str(i))
+                latencias.append(time.perf_counter() - t)
+        finally:
+            duracion = time.perf_counter() - inicio
+            detener.set()
+            for proceso in procesos:
+                proceso.join()
+            Configuracion.objects.filter(nombre=NOMBRE_PRUEBA).delete()
+
+        return latencias, contador.value / duracion
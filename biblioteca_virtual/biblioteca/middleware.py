@@ -0,0 +1,64 @@
+import time
+
+from django.conf import settings
+
+from . import auditoria, perfilador, routers
+
+
+# ---------------------------------------
+# Auditoría: volcado de respaldo al final del request
+# ---------------------------------------
+class AuditoriaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        auditoria.volcar_si_vencido()
+        return response
+
+
+# ---------------------------------------
+# Réplicas: leer de la primaria justo después de escribir
+# ---------------------------------------
+class ReplicaMiddleware:
+    COOKIE = 'leer_primaria_hasta'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            hasta = float(request.COOKIES.get(self.COOKIE, 0))
+        except ValueError:
+            hasta = 0
+        tokens = routers.iniciar_request(fijar_primaria=time.time() < hasta)
+        try:
+            response = self.get_response(request)
+        finally:
+            escribio = routers.terminar_request(tokens)
+
+        if escribio:
+            # Las réplicas pueden ir atrasadas: por unos segundos este
+            # navegador lee de la primaria y ve sus propios cambios
+            ventana = settings.REPLICA_VENTANA_ESCRITURA
+            response.set_cookie(self.COOKIE, str(time.time() + ventana), max_age=ventana,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+# ---------------------------------------
+# Perfilador bajo demanda (ver perfilador.py)
+# ---------------------------------------
+class PerfiladorMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Devolver una respuesta aquí reemplaza la llamada normal a la vista
+        if perfilador.debe_perfilar(request):
+            return perfilador.perfilar(request, view_func, view_args, view_kwargs)
+        return None
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0002_configuracion_libro_descripcion_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrestamoHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prestamo_original', models.BigIntegerField(unique=True)),
+                ('fecha_prestamo', models.DateField()),
+                ('fecha_devolucion', models.DateField(blank=True, null=True)),
+                ('renovado', models.BooleanField(default=False)),
+                ('multa_generada', models.BooleanField(default=False)),
+                ('fecha_archivado', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='usuario',
+            name='rol',
+            field=models.CharField(choices=[('administrador', 'Administrador'), ('bibliotecario', 'Bibliotecario'), ('profesor', 'Profesor'), ('alumno', 'Alumno')], default='alumno', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['devuelto', 'fecha_devolucion'], name='biblioteca__devuelt_50e752_idx'),
+        ),
+        migrations.AddField(
+            model_name='prestamohistorico',
+            name='libro',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='biblioteca.libro'),
+        ),
+        migrations.AddField(
+            model_name='prestamohistorico',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='prestamohistorico',
+            index=models.Index(fields=['usuario', 'fecha_prestamo'], name='biblioteca__usuario_33cb19_idx'),
+        ),
+    ]
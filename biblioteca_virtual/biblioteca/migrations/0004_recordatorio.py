@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0003_archivo_prestamos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recordatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('por_vencer', 'Por vencer'), ('vencido', 'Vencido')], max_length=20)),
+                ('fecha_devolucion', models.DateField()),
+                ('fecha_envio', models.DateTimeField(auto_now_add=True)),
+                ('prestamo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='biblioteca.prestamo')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('prestamo', 'tipo', 'fecha_devolucion'), name='recordatorio_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0004_recordatorio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('accion', models.CharField(choices=[('reserva', 'Reserva'), ('renovacion', 'Renovación'), ('pago_multa', 'Pago de multa'), ('eliminacion_usuario', 'Eliminación de usuario')], max_length=30)),
+                ('id_prestamo', models.BigIntegerField(blank=True, null=True)),
+                ('id_reserva', models.BigIntegerField(blank=True, null=True)),
+                ('codigo_pago', models.CharField(blank=True, max_length=20)),
+                ('monto', models.IntegerField(blank=True, null=True)),
+                ('detalle', models.CharField(blank=True, max_length=255)),
+                ('actor', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('libro', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='eventos_auditoria', to='biblioteca.libro')),
+                ('usuario', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='eventos_auditoria', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha'], name='biblioteca__fecha_ebd52a_idx'), models.Index(fields=['usuario', 'fecha'], name='biblioteca__usuario_e8755b_idx'), models.Index(fields=['libro', 'fecha'], name='biblioteca__libro_i_0b3822_idx'), models.Index(fields=['codigo_pago'], name='biblioteca__codigo__3aeac7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0005_evento_auditoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMoraDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('rol', models.CharField(choices=[('administrador', 'Administrador'), ('bibliotecario', 'Bibliotecario'), ('profesor', 'Profesor'), ('alumno', 'Alumno')], max_length=20)),
+                ('activos', models.PositiveIntegerField(default=0)),
+                ('vencidos', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'rol'), name='resumen_mora_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenPrestamosDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('rol', models.CharField(choices=[('administrador', 'Administrador'), ('bibliotecario', 'Bibliotecario'), ('profesor', 'Profesor'), ('alumno', 'Alumno')], max_length=20)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='biblioteca.libro')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'libro', 'rol'), name='resumen_prestamos_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenReservasDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='biblioteca.libro')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'libro'), name='resumen_reservas_unico')],
+            },
+        ),
+    ]
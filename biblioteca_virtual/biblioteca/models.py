@@ -52,6 +52,8 @@ class Prestamo(models.Model):
     devuelto = models.BooleanField(default=False)
     multa_generada = models.BooleanField(default=False)
 
+    archivado = False
+
     def save(self, *args, **kwargs):
         # Asignar fecha de devolución si no existe
         if not self.fecha_devolucion:
@@ -72,6 +74,46 @@ class Prestamo(models.Model):
         estado = "Devuelto" if self.devuelto else "Pendiente"
         return f"{self.usuario} - {self.libro} ({estado})"
 
+    class Meta:
+        indexes = [
+            # Morosos y selección de préstamos a archivar
+            models.Index(fields=['devuelto', 'fecha_devolucion']),
+        ]
+
+
+# ---------------------------------------------------------
+# Préstamo histórico (préstamos devueltos archivados)
+# ---------------------------------------------------------
+class PrestamoHistorico(models.Model):
+    # Los préstamos devueltos hace tiempo se mueven aquí (ver archivo.py)
+    # para que la tabla Prestamo solo crezca con los préstamos activos.
+    prestamo_original = models.BigIntegerField(unique=True)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE)
+    fecha_prestamo = models.DateField()
+    fecha_devolucion = models.DateField(blank=True, null=True)
+    renovado = models.BooleanField(default=False)
+    multa_generada = models.BooleanField(default=False)
+    fecha_archivado = models.DateTimeField(auto_now_add=True)
+
+    # Mismo "contrato" que Prestamo para poder mezclarlos en las plantillas
+    devuelto = True
+    archivado = True
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', 'fecha_prestamo']),
+        ]
+
+    def dias_mora(self):
+        return 0
+
+    def monto_multa(self):
+        return 0
+
+    def __str__(self):
+        return f"{self.usuario} - {self.libro} (Archivado)"
+
 
 # ---------------------------------------------------------
 # Reserva
@@ -86,6 +128,138 @@ class Reserva(models.Model):
         return f"{self.usuario} reservó {self.libro}"
 
 
+# ---------------------------------------------------------
+# Recordatorio enviado (vencimientos y moras)
+# ---------------------------------------------------------
+class Recordatorio(models.Model):
+    TIPOS = (
+        ('por_vencer', 'Por vencer'),
+        ('vencido', 'Vencido'),
+    )
+    prestamo = models.ForeignKey(Prestamo, on_delete=models.CASCADE)
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    # Se guarda la fecha avisada: si el préstamo se renueva, se vuelve a avisar
+    fecha_devolucion = models.DateField()
+    fecha_envio = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['prestamo', 'tipo', 'fecha_devolucion'], name='recordatorio_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.prestamo}"
+
+
+# ---------------------------------------------------------
+# Evento de auditoría (registro de solo inserción)
+# ---------------------------------------------------------
+class EventoAuditoria(models.Model):
+    ACCIONES = (
+        ('reserva', 'Reserva'),
+        ('renovacion', 'Renovación'),
+        ('pago_multa', 'Pago de multa'),
+        ('eliminacion_usuario', 'Eliminación de usuario'),
+    )
+    fecha = models.DateTimeField()
+    accion = models.CharField(max_length=30, choices=ACCIONES)
+    # Sin restricción de clave foránea: el registro sobrevive a usuarios,
+    # libros y préstamos eliminados o archivados y nunca se modifica
+    actor = models.ForeignKey(Usuario, on_delete=models.DO_NOTHING, db_constraint=False,
+                              null=True, related_name='+')
+    usuario = models.ForeignKey(Usuario, on_delete=models.DO_NOTHING, db_constraint=False,
+                                null=True, related_name='eventos_auditoria')
+    libro = models.ForeignKey(Libro, on_delete=models.DO_NOTHING, db_constraint=False,
+                              null=True, related_name='eventos_auditoria')
+    id_prestamo = models.BigIntegerField(blank=True, null=True)
+    id_reserva = models.BigIntegerField(blank=True, null=True)
+    codigo_pago = models.CharField(max_length=20, blank=True)
+    monto = models.IntegerField(blank=True, null=True)
+    detalle = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha']),
+            models.Index(fields=['usuario', 'fecha']),
+            models.Index(fields=['libro', 'fecha']),
+            models.Index(fields=['codigo_pago']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("Los eventos de auditoría no se pueden modificar")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Los eventos de auditoría no se pueden eliminar")
+
+    def __str__(self):
+        return f"{self.get_accion_display()} ({self.fecha:%Y-%m-%d %H:%M})"
+
+
+# ---------------------------------------------------------
+# Libros similares ("quienes leyeron esto también leyeron")
+# ---------------------------------------------------------
+class LibroSimilar(models.Model):
+    # Calculado en lote por manage.py calcular_recomendaciones
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='similares')
+    recomendado = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='recomendado_en')
+    puntaje = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['libro', 'recomendado'], name='libro_similar_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.libro} -> {self.recomendado} ({self.puntaje:.2f})"
+
+
+# ---------------------------------------------------------
+# Estadísticas precalculadas (ver estadisticas.py)
+# ---------------------------------------------------------
+class ResumenPrestamosDia(models.Model):
+    # Préstamos iniciados por día, libro y rol del usuario
+    fecha = models.DateField()
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE)
+    rol = models.CharField(max_length=20, choices=Usuario.ROLES)
+    cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'libro', 'rol'], name='resumen_prestamos_unico'),
+        ]
+
+
+class ResumenReservasDia(models.Model):
+    # Reservas hechas por día y libro
+    fecha = models.DateField()
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE)
+    cantidad = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'libro'], name='resumen_reservas_unico'),
+        ]
+
+
+class ResumenMoraDia(models.Model):
+    # Foto diaria de préstamos activos y vencidos por rol
+    fecha = models.DateField()
+    rol = models.CharField(max_length=20, choices=Usuario.ROLES)
+    activos = models.PositiveIntegerField(default=0)
+    vencidos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'rol'], name='resumen_mora_unico'),
+        ]
+
+    @property
+    def porcentaje_vencidos(self):
+        return round(100 * self.vencidos / self.activos) if self.activos else 0
+
+
 # ---------------------------------------------------------
 # Configuración del sistema
 # ---------------------------------------------------------
@@ -93,5 +267,14 @@ class Configuracion(models.Model):
     nombre = models.CharField(max_length=100)
     valor = models.CharField(max_length=200)
 
+    @classmethod
+    def obtener(cls, nombre, defecto=None):
+        config = cls.objects.filter(nombre=nombre).first()
+        return config.valor if config else defecto
+
+    @classmethod
+    def guardar(cls, nombre, valor):
+        cls.objects.update_or_create(nombre=nombre, defaults={'valor': str(valor)})
+
     def __str__(self):
         return f"{self.nombre}: {self.valor}"
@@ -0,0 +1,237 @@
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import BadRequest, PermissionDenied, SuspiciousOperation
+from django.db import connections
+from django.http import Http404
+from django.utils import timezone
+
+NOMBRE_VALIDO = re.compile(r'^[\w.-]+\.json$')
+
+# Estado con el que Django responde a las excepciones que maneja él mismo
+# (ver django.core.handlers.exception.response_for_exception)
+ESTADOS_EXCEPCION = (
+    (Http404, 404),
+    (PermissionDenied, 403),
+    (BadRequest, 400),
+    (SuspiciousOperation, 400),
+)
+
+
+def _directorio():
+    directorio = Path(settings.PERFILADOR_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+# ---------------------------------------
+# Cuándo perfilar
+# ---------------------------------------
+def puede_ver(usuario):
+    return usuario.is_authenticated and (usuario.is_staff or usuario.rol == 'administrador')
+
+
+def debe_perfilar(request):
+    """Por pedido explícito de staff (?perfilar=1 o cabecera X-Perfilar) o por
+    muestreo de 1 cada N requests según PERFILADOR_MUESTREO[url_name]."""
+    pedido = request.GET.get('perfilar') == '1' or request.headers.get('X-Perfilar') == '1'
+    if pedido and puede_ver(request.user):
+        return True
+    muestreo = settings.PERFILADOR_MUESTREO
+    cada = muestreo.get(getattr(request.resolver_match, 'url_name', None))
+    return bool(cada) and random.randrange(cada) == 0
+
+
+# ---------------------------------------
+# Muestreo de pilas y captura de SQL
+# ---------------------------------------
+class _Muestreador(threading.Thread):
+    """Hilo que cada `intervalo` segundos anota la pila del hilo perfilado,
+    desde `raiz` (excluida) hasta la función que se está ejecutando."""
+
+    def __init__(self, hilo_id, raiz, intervalo):
+        super().__init__(daemon=True)
+        self.hilo_id = hilo_id
+        self.raiz = raiz
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self.detener = threading.Event()
+
+    def run(self):
+        while not self.detener.wait(self.intervalo):
+            marco = sys._current_frames().get(self.hilo_id)
+            pila = []
+            while marco is not None and marco is not self.raiz:
+                codigo = marco.f_code
+                pila.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                marco = marco.f_back
+            if pila:
+                self.pilas[';'.join(reversed(pila))] += 1
+
+
+def perfilar(request, view_func, view_args, view_kwargs):
+    """Ejecuta la vista midiendo su pila por muestreo y las consultas SQL de
+    todas las conexiones, guarda el perfil y devuelve la respuesta. Si la
+    vista lanza una excepción el perfil se guarda con el estado que Django
+    devolverá por ella y la excepción se propaga.
+
+    Como la vista se llama desde process_view, Django no la envuelve en la
+    transacción de ATOMIC_REQUESTS: si se activa, las vistas perfiladas
+    corren sin ella."""
+    consultas = []
+
+    def capturar(execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            consultas.append({
+                'sql': sql[:2000],
+                'ms': round((time.perf_counter() - inicio) * 1000, 3),
+                'alias': context['connection'].alias,
+            })
+
+    intervalo = settings.PERFILADOR_INTERVALO
+    muestreador = _Muestreador(threading.get_ident(), sys._getframe(), intervalo)
+    estado = 500
+    inicio = time.perf_counter()
+    muestreador.start()
+    try:
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(capturar))
+            response = view_func(request, *view_args, **view_kwargs)
+            # Las respuestas diferidas se renderizan aquí para incluirlas
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+            estado = response.status_code
+        return response
+    except Exception as error:
+        estado = next((codigo for tipo, codigo in ESTADOS_EXCEPCION if isinstance(error, tipo)), 500)
+        raise
+    finally:
+        duracion = time.perf_counter() - inicio
+        muestreador.detener.set()
+        muestreador.join()
+        guardar({
+            'fecha': timezone.now().isoformat(),
+            'url_name': getattr(request.resolver_match, 'url_name', '') or '',
+            'ruta': request.get_full_path(),
+            'metodo': request.method,
+            'usuario': request.user.get_username() if request.user.is_authenticated else '',
+            'estado': estado,
+            'duracion_ms': round(duracion * 1000, 2),
+            'intervalo_ms': intervalo * 1000,
+            'pilas': dict(muestreador.pilas),
+            'consultas': consultas,
+        })
+
+
+# ---------------------------------------
+# Almacenamiento en disco (anillo acotado)
+# ---------------------------------------
+def guardar(perfil):
+    directorio = _directorio()
+    nombre = f"{time.time_ns()}-{perfil['url_name'] or 'sin_nombre'}.json"
+    temporal = directorio / f".{nombre}.tmp"
+    temporal.write_text(json.dumps(perfil), encoding='utf-8')
+    os.replace(temporal, directorio / nombre)
+
+    # Se conservan solo los PERFILADOR_MAX más recientes
+    maximo = settings.PERFILADOR_MAX
+    for viejo in sorted(directorio.glob('*.json'), reverse=True)[maximo:]:
+        viejo.unlink(missing_ok=True)
+    return nombre
+
+
+def listar():
+    """Resumen de los perfiles guardados, del más nuevo al más viejo."""
+    perfiles = []
+    for archivo in sorted(_directorio().glob('*.json'), reverse=True):
+        try:
+            perfil = json.loads(archivo.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue  # pudo ser descartado mientras se listaba
+        perfiles.append({
+            'nombre': archivo.name,
+            'fecha': perfil['fecha'],
+            'url_name': perfil['url_name'],
+            'ruta': perfil['ruta'],
+            'usuario': perfil['usuario'],
+            'estado': perfil['estado'],
+            'duracion_ms': perfil['duracion_ms'],
+            'consultas': len(perfil['consultas']),
+            'sql_ms': round(sum(c['ms'] for c in perfil['consultas']), 2),
+        })
+    return perfiles
+
+
+def cargar(nombre):
+    """Perfil completo o None si el nombre no es válido o ya no existe."""
+    if not NOMBRE_VALIDO.match(nombre):
+        return None
+    try:
+        return json.loads((_directorio() / nombre).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+# ---------------------------------------
+# Árbol de llamadas para el visor
+# ---------------------------------------
+def arbol(pilas):
+    """Convierte las pilas muestreadas ({'a;b;c': n}) en las filas del visor,
+    cada nodo seguido de sus hijos: {'nombre', 'muestras', 'porcentaje',
+    'profundidad', 'inicio', 'ancho'}. `inicio` y `ancho` son porcentajes del
+    total y ubican la barra en la flame graph. Es una lista plana, recorrida
+    sin recursión, para que ni el recorrido ni la plantilla dependan de la
+    profundidad de las pilas. Se descartan los nodos por debajo de
+    PERFILADOR_UMBRAL."""
+    raiz = {'nombre': 'vista', 'muestras': 0, 'hijos': {}}
+    for pila, muestras in pilas.items():
+        raiz['muestras'] += muestras
+        nodo = raiz
+        for nombre in pila.split(';'):
+            nodo = nodo['hijos'].setdefault(nombre, {'nombre': nombre, 'muestras': 0, 'hijos': {}})
+            nodo['muestras'] += muestras
+
+    total = raiz['muestras'] or 1
+    umbral = settings.PERFILADOR_UMBRAL
+
+    filas = []
+    pendientes = [(raiz, 0, 0)]  # (nodo, profundidad, muestras a su izquierda)
+    while pendientes:
+        nodo, profundidad, inicio = pendientes.pop()
+        filas.append({
+            'nombre': nodo['nombre'],
+            'muestras': nodo['muestras'],
+            'porcentaje': round(100 * nodo['muestras'] / total, 1),
+            'profundidad': profundidad,
+            'inicio': round(100 * inicio / total, 3),
+            'ancho': round(100 * nodo['muestras'] / total, 3),
+        })
+        hijos = sorted(
+            (h for h in nodo['hijos'].values() if h['muestras'] / total >= umbral),
+            key=lambda h: -h['muestras'],
+        )
+        siguientes = []
+        for hijo in hijos:
+            siguientes.append((hijo, profundidad + 1, inicio))
+            inicio += hijo['muestras']
+        # Al revés para sacar de la pila primero al hijo con más muestras
+        pendientes.extend(reversed(siguientes))
+
+    return {
+        'muestras': raiz['muestras'],
+        'niveles': max(fila['profundidad'] for fila in filas) + 1,
+        'filas': filas,
+    }
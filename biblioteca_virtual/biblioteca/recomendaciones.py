@@ -0,0 +1,150 @@
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from scipy import sparse
+
+from .models import Configuracion, Libro, LibroSimilar, Prestamo, PrestamoHistorico
+
+
+# Marca de agua en Configuracion: último préstamo considerado y cuántos
+# préstamos (activos y archivados) había entonces
+MARCA_RECOMENDACIONES = 'recomendaciones_ultimo_prestamo'
+CANTIDAD_RECOMENDACIONES = 'recomendaciones_cantidad_prestamos'
+LOTE_BD = 500
+
+
+# ---------------------------------------
+# Cálculo en lote de la matriz de similitud
+# ---------------------------------------
+def _pares_usuario_libro():
+    """Arreglos (usuarios, libros) con un elemento por préstamo, activo o archivado."""
+    filas = chain(
+        Prestamo.objects.values_list('usuario_id', 'libro_id').iterator(chunk_size=10000),
+        PrestamoHistorico.objects.values_list('usuario_id', 'libro_id').iterator(chunk_size=10000),
+    )
+    datos = np.fromiter(chain.from_iterable(filas), dtype=np.int64)
+    return datos[0::2], datos[1::2]
+
+
+def matriz_similitud(usuarios, libros, min_coincidencias):
+    """Similitud coseno entre libros según sus lectores en común.
+
+    Devuelve (ids de libro, matriz dispersa libro x libro). Los pares con
+    menos de `min_coincidencias` lectores en común se descartan."""
+    libro_ids, columnas = np.unique(libros, return_inverse=True)
+    _, filas = np.unique(usuarios, return_inverse=True)
+    lectura = sparse.csr_matrix(
+        (np.ones(len(filas), dtype=np.float32), (filas, columnas)),
+        shape=(filas.max() + 1, len(libro_ids)),
+    )
+    lectura.data[:] = 1  # un usuario cuenta una sola vez por libro
+
+    coincidencias = (lectura.T @ lectura).tocsr()
+    lectores = coincidencias.diagonal()
+    coincidencias.setdiag(0)
+    coincidencias.data[coincidencias.data < min_coincidencias] = 0
+    coincidencias.eliminate_zeros()
+
+    inversa = sparse.diags(1 / np.sqrt(lectores))
+    return libro_ids, (inversa @ coincidencias @ inversa).tocsr()
+
+
+def _mejores(similitud, fila, k):
+    """Columnas y puntajes de los `k` valores más altos de una fila CSR."""
+    inicio, fin = similitud.indptr[fila], similitud.indptr[fila + 1]
+    columnas, puntajes = similitud.indices[inicio:fin], similitud.data[inicio:fin]
+    if fin - inicio > k:
+        elegidos = np.argpartition(-puntajes, k)[:k]
+        columnas, puntajes = columnas[elegidos], puntajes[elegidos]
+    return columnas, puntajes
+
+
+def calcular_recomendaciones(completo=False):
+    """Recalcula los k libros más similares a cada libro. En modo
+    incremental solo se reescriben los libros prestados desde la última
+    ejecución y sus vecinos, que son los únicos cuyos puntajes cambian.
+    Si desde entonces se borró algún préstamo (o el usuario o libro que lo
+    tenía) se recalcula todo, porque esos puntajes bajan en libros que no
+    aparecen entre los nuevos. Devuelve (libros actualizados, filas guardadas)."""
+    k = settings.RECOMENDACIONES_TOP_K
+    minimo = settings.RECOMENDACIONES_MIN_COINCIDENCIAS
+
+    marca = Configuracion.obtener(MARCA_RECOMENDACIONES)
+    hasta = max(
+        Prestamo.objects.aggregate(m=Max('id'))['m'] or 0,
+        PrestamoHistorico.objects.aggregate(m=Max('prestamo_original'))['m'] or 0,
+    )
+    cantidad = Prestamo.objects.count() + PrestamoHistorico.objects.count()
+    if not completo and marca is not None:
+        # Archivar mueve filas de una tabla a la otra sin cambiar el total
+        nuevos = (
+            Prestamo.objects.filter(id__gt=int(marca)).count()
+            + PrestamoHistorico.objects.filter(prestamo_original__gt=int(marca)).count()
+        )
+        anterior = Configuracion.obtener(CANTIDAD_RECOMENDACIONES)
+        completo = anterior is None or cantidad < int(anterior) + nuevos
+    completo = completo or marca is None
+    if not completo and hasta <= int(marca):
+        return 0, 0
+
+    usuarios, libros = _pares_usuario_libro()
+    if not len(libros):
+        LibroSimilar.objects.all().delete()
+        return 0, 0
+    libro_ids, similitud = matriz_similitud(usuarios, libros, minimo)
+
+    if completo:
+        afectados = np.arange(len(libro_ids))
+    else:
+        nuevos = set(chain(
+            Prestamo.objects.filter(id__gt=int(marca)).values_list('libro_id', flat=True),
+            PrestamoHistorico.objects.filter(prestamo_original__gt=int(marca)).values_list('libro_id', flat=True),
+        ))
+        tocados = np.flatnonzero(np.isin(libro_ids, list(nuevos)))
+        vecinos = similitud[tocados].indices
+        afectados = np.union1d(tocados, vecinos)
+
+    filas = []
+    for fila in afectados:
+        columnas, puntajes = _mejores(similitud, fila, k)
+        filas.extend(
+            LibroSimilar(libro_id=int(libro_ids[fila]), recomendado_id=int(libro_ids[c]), puntaje=float(p))
+            for c, p in zip(columnas, puntajes)
+        )
+
+    with transaction.atomic():
+        if completo:
+            LibroSimilar.objects.all().delete()
+        else:
+            ids = [int(i) for i in libro_ids[afectados]]
+            for i in range(0, len(ids), LOTE_BD):
+                LibroSimilar.objects.filter(libro_id__in=ids[i:i + LOTE_BD]).delete()
+        LibroSimilar.objects.bulk_create(filas, batch_size=LOTE_BD)
+        Configuracion.guardar(MARCA_RECOMENDACIONES, hasta)
+        Configuracion.guardar(CANTIDAD_RECOMENDACIONES, cantidad)
+
+    return len(afectados), len(filas)
+
+
+# ---------------------------------------
+# Recomendaciones para un usuario
+# ---------------------------------------
+def recomendaciones_para(usuario, limite=None):
+    """Libros disponibles más similares a los que el usuario ya leyó, en una
+    sola consulta sobre la tabla precalculada LibroSimilar."""
+    if limite is None:
+        limite = settings.RECOMENDACIONES_LIMITE
+    leidos_activos = Prestamo.objects.filter(usuario=usuario).values('libro_id')
+    leidos_archivados = PrestamoHistorico.objects.filter(usuario=usuario).values('libro_id')
+    return (
+        Libro.objects
+        .filter(disponible=True)
+        .filter(Q(recomendado_en__libro__in=leidos_activos) | Q(recomendado_en__libro__in=leidos_archivados))
+        .exclude(id__in=leidos_activos)
+        .exclude(id__in=leidos_archivados)
+        .annotate(puntaje=Sum('recomendado_en__puntaje'))
+        .order_by('-puntaje')[:limite]
+    )
@@ -0,0 +1,118 @@
+import logging
+from datetime import timedelta
+from itertools import groupby
+from smtplib import SMTPException
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Case, Exists, OuterRef, Value, When
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Prestamo, Recordatorio
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Préstamos a recordar
+# ---------------------------------------
+def prestamos_a_recordar(dias):
+    """Préstamos activos que vencen dentro de `dias` días o ya vencieron y
+    cuyo aviso todavía no se envió. Una sola consulta sobre el índice
+    (devuelto, fecha_devolucion), ordenada por usuario para agrupar."""
+    hoy = timezone.now().date()
+    tipo = Case(
+        When(fecha_devolucion__lt=hoy, then=Value('vencido')),
+        default=Value('por_vencer'),
+    )
+    enviado = Recordatorio.objects.filter(
+        prestamo=OuterRef('pk'),
+        tipo=OuterRef('tipo'),
+        fecha_devolucion=OuterRef('fecha_devolucion'),
+    )
+    return (
+        Prestamo.objects
+        .filter(devuelto=False, fecha_devolucion__lte=hoy + timedelta(days=dias))
+        .exclude(usuario__email='')
+        .annotate(tipo=tipo)
+        .exclude(Exists(enviado))
+        .select_related('usuario', 'libro')
+        .order_by('usuario_id', 'fecha_devolucion')
+    )
+
+
+# ---------------------------------------
+# Envío de recordatorios
+# ---------------------------------------
+def _mensaje(usuario, prestamos):
+    contexto = {
+        'usuario': usuario,
+        'por_vencer': [p for p in prestamos if p.tipo == 'por_vencer'],
+        'vencidos': [p for p in prestamos if p.tipo == 'vencido'],
+    }
+    return EmailMessage(
+        subject="Recordatorio de préstamos - Biblioteca Virtual",
+        body=render_to_string('biblioteca/email/recordatorio.txt', contexto),
+        to=[usuario.email],
+    )
+
+
+def _enviar_lote(conexion, lote, registrar=True):
+    """Envía los mensajes del lote uno por uno sobre la misma conexión y
+    registra como avisados solo los préstamos de los correos que salieron.
+    Una dirección rechazada o inválida se anota en el log y no detiene al
+    resto. Devuelve (correos enviados, préstamos avisados)."""
+    correos = 0
+    avisados = []
+    for mensaje, prestamos in lote:
+        try:
+            conexion.send_messages([mensaje])
+        except (SMTPException, ValueError):
+            logger.exception("No se pudo enviar el recordatorio a %s", ', '.join(mensaje.to))
+            continue
+        correos += 1
+        avisados.extend(prestamos)
+    if registrar:
+        Recordatorio.objects.bulk_create(
+            [Recordatorio(prestamo=p, tipo=p.tipo, fecha_devolucion=p.fecha_devolucion) for p in avisados],
+            ignore_conflicts=True,
+        )
+    return correos, len(avisados)
+
+
+def enviar_recordatorios(dias=None, lote=None, simular=False):
+    """Envía un resumen por usuario con sus préstamos por vencer y vencidos,
+    reutilizando una sola conexión SMTP y registrando los avisos de a `lote`
+    correos. Los avisos enviados quedan registrados, así que volver a
+    ejecutarlo no duplica correos y reintenta los que fallaron. Devuelve
+    (correos enviados, préstamos avisados, correos fallidos)."""
+    if dias is None:
+        dias = settings.RECORDATORIOS_DIAS
+    if lote is None:
+        lote = settings.RECORDATORIOS_LOTE
+
+    pendientes = prestamos_a_recordar(dias).iterator(chunk_size=2000)
+    armados = enviados = avisados = 0
+    actual = []
+
+    def enviar():
+        nonlocal enviados, avisados
+        correos, prestamos = _enviar_lote(conexion, actual, registrar=not simular)
+        enviados += correos
+        avisados += prestamos
+
+    # En simulación se arman los correos pero no se envían ni se registran
+    backend = 'django.core.mail.backends.dummy.EmailBackend' if simular else None
+    with get_connection(backend, fail_silently=False) as conexion:
+        for _, grupo in groupby(pendientes, key=attrgetter('usuario_id')):
+            prestamos = list(grupo)
+            actual.append((_mensaje(prestamos[0].usuario, prestamos), prestamos))
+            armados += 1
+            if len(actual) >= lote:
+                enviar()
+                actual = []
+        if actual:
+            enviar()
+
+    return enviados, avisados, armados - enviados
@@ -0,0 +1,144 @@
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+# Estado del request actual (ver iniciar_request / ReplicaMiddleware)
+_usar_replica = ContextVar('usar_replica', default=False)
+_fijado_primaria = ContextVar('fijado_primaria', default=False)
+_escribio = ContextVar('escribio', default=False)
+_falla_replica = ContextVar('falla_replica', default=None)
+
+# Escrituras que no obligan a leer de la primaria
+ESCRITURAS_INTERNAS = {'sessions.session', 'biblioteca.eventoauditoria'}
+
+# Réplicas que fallaron: alias -> momento hasta el que no se usan
+_caidas = {}
+
+
+def _marcar_caida(alias):
+    _caidas[alias] = time.monotonic() + settings.REPLICA_REINTENTO
+    connections[alias].close()
+
+
+def _replica_disponible(alias):
+    if _caidas.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        _marcar_caida(alias)
+        return False
+    _caidas.pop(alias, None)
+    return True
+
+
+def alias_lectura():
+    """Alias desde el que conviene leer ahora: una réplica disponible si el
+    request lo permite y el usuario no escribió hace poco; si no, la primaria."""
+    if not _usar_replica.get() or _fijado_primaria.get():
+        return DEFAULT_DB_ALIAS
+    replicas = [alias for alias in settings.REPLICAS if _replica_disponible(alias)]
+    if not replicas:
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+def iniciar_request(fijar_primaria):
+    """Estado inicial de un request; devuelve los tokens para terminar_request."""
+    return _fijado_primaria.set(fijar_primaria), _escribio.set(False)
+
+
+def terminar_request(tokens):
+    """Restaura el estado y dice si durante el request hubo escrituras."""
+    escribio = _escribio.get()
+    _fijado_primaria.reset(tokens[0])
+    _escribio.reset(tokens[1])
+    return escribio
+
+
+# ---------------------------------------
+# Router de base de datos
+# ---------------------------------------
+class RouterReplicas:
+    """Las escrituras siempre van a la primaria. Las lecturas van a una
+    réplica solo dentro de vistas marcadas con @lectura_replica; después de
+    una escritura el resto del request (y los siguientes segundos, ver
+    ReplicaMiddleware) lee de la primaria para ver sus propios cambios."""
+
+    def db_for_read(self, model, **hints):
+        return alias_lectura()
+
+    def db_for_write(self, model, **hints):
+        # Guardar la sesión o volcar la auditoría no son cambios del usuario
+        if model._meta.label_lower not in ESCRITURAS_INTERNAS:
+            _escribio.set(True)
+            _fijado_primaria.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Todas las bases tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación
+        return db == DEFAULT_DB_ALIAS
+
+
+# ---------------------------------------
+# Decorador para vistas de solo lectura
+# ---------------------------------------
+def _vigilar_replica(execute, sql, params, many, context):
+    """execute_wrapper de las réplicas: anota qué conexión lanzó el error."""
+    try:
+        return execute(sql, params, many, context)
+    except DatabaseError as error:
+        _falla_replica.set((context['connection'].alias, error))
+        raise
+
+
+def _replica_que_fallo(error):
+    """Alias de la réplica en la que se originó `error`, o None si vino de
+    la primaria o de otro lado."""
+    falla = _falla_replica.get()
+    if falla is None or falla[0] not in settings.REPLICAS:
+        return None
+    while error is not None:
+        if error is falla[1]:
+            return falla[0]
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def lectura_replica(view):
+    """Permite que las consultas de la vista (GET/HEAD) se lean de una réplica.
+    Si una consulta falla en una réplica (caída, sin tablas, conexión
+    cortada), la réplica se marca caída y la vista se repite leyendo de la
+    primaria. Los errores de la primaria se propagan sin repetir nada."""
+    @wraps(view)
+    def envoltura(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        tokens = _usar_replica.set(True), _falla_replica.set(None)
+        try:
+            try:
+                with ExitStack() as pila:
+                    for alias in settings.REPLICAS:
+                        pila.enter_context(connections[alias].execute_wrapper(_vigilar_replica))
+                    return view(request, *args, **kwargs)
+            except DatabaseError as error:
+                alias = _replica_que_fallo(error)
+                if alias is None:
+                    raise
+                _marcar_caida(alias)
+                _usar_replica.set(False)
+                return view(request, *args, **kwargs)
+        finally:
+            _usar_replica.reset(tokens[0])
+            _falla_replica.reset(tokens[1])
+    return envoltura
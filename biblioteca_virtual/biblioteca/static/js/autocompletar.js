@@ -0,0 +1,91 @@
+// Autocompletado del buscador de libros en los paneles de alumno y profesor.
+// Pide sugerencias a /libro/autocompletar/ y, al elegir una, deja visible
+// solo la tarjeta de ese libro.
+(function () {
+    const input = document.getElementById('buscar-libro');
+    if (!input) {
+        return;
+    }
+    const lista = document.getElementById('sugerencias-libro');
+    const aviso = document.getElementById('aviso-busqueda');
+    const tarjetas = document.querySelectorAll('[data-libro-id]');
+    let espera = null;
+    let ultimaConsulta = '';
+
+    function mostrarTarjetas(libroId) {
+        let visibles = 0;
+        tarjetas.forEach(function (tarjeta) {
+            const mostrar = libroId === null || tarjeta.dataset.libroId === String(libroId);
+            tarjeta.classList.toggle('d-none', !mostrar);
+            visibles += mostrar ? 1 : 0;
+        });
+        aviso.classList.toggle('d-none', visibles > 0);
+    }
+
+    function cerrarLista() {
+        lista.innerHTML = '';
+        lista.classList.add('d-none');
+    }
+
+    function pintar(resultados) {
+        lista.innerHTML = '';
+        resultados.forEach(function (libro) {
+            const item = document.createElement('button');
+            item.type = 'button';
+            item.className = 'list-group-item list-group-item-action d-flex justify-content-between align-items-center';
+            item.textContent = libro.titulo + ' - ' + libro.autor;
+            if (!libro.disponible) {
+                const badge = document.createElement('span');
+                badge.className = 'badge bg-secondary ms-2';
+                badge.textContent = 'Prestado';
+                item.appendChild(badge);
+            }
+            item.addEventListener('click', function () {
+                input.value = libro.titulo;
+                cerrarLista();
+                mostrarTarjetas(libro.id);
+            });
+            lista.appendChild(item);
+        });
+        lista.classList.toggle('d-none', resultados.length === 0);
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(espera);
+        const consulta = input.value.trim();
+        if (!consulta) {
+            cerrarLista();
+            mostrarTarjetas(null);
+            return;
+        }
+        espera = setTimeout(function () {
+            ultimaConsulta = consulta;
+            fetch(input.dataset.url + '?q=' + encodeURIComponent(consulta))
+                .then(function (respuesta) {
+                    if (!respuesta.ok) {
+                        throw new Error('Autocompletado respondió ' + respuesta.status);
+                    }
+                    return respuesta.json();
+                })
+                .then(function (datos) {
+                    // Se descartan respuestas de consultas ya superadas
+                    if (consulta === ultimaConsulta) {
+                        pintar(datos.resultados);
+                    }
+                })
+                .catch(function () {
+                    // Sin sugerencias (sesión vencida, red caída...): el
+                    // buscador sigue usable y la próxima tecla reintenta
+                    if (consulta === ultimaConsulta) {
+                        cerrarLista();
+                    }
+                });
+        }, 150);
+    });
+
+    document.addEventListener('click', function (evento) {
+        if (evento.target !== input && !lista.contains(evento.target)) {
+            cerrarLista();
+        }
+    });
+})();
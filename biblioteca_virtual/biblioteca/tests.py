@@ -1,3 +1,645 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPRecipientsRefused
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import DatabaseError, connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import archivo, auditoria, autocompletar, estadisticas, perfilador, recomendaciones, recordatorios, routers
+from .middleware import ReplicaMiddleware
+from .models import (
+    EventoAuditoria, Libro, LibroSimilar, Prestamo, PrestamoHistorico, Recordatorio, ResumenMoraDia,
+    ResumenPrestamosDia, Usuario,
+)
+
+# Las plantillas se renderizan sin haber corrido collectstatic
+SIN_MANIFIESTO = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+# ---------------------------------------
+# Archivado de préstamos
+# ---------------------------------------
+class ArchivoPrestamosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user('alumno1', password='clave', rol='alumno')
+        cls.otro = Usuario.objects.create_user('profesor1', password='clave', rol='profesor')
+        cls.libros = [
+            Libro.objects.create(titulo=f"Libro {i}", autor="Autor", isbn=f"978000000000{i}")
+            for i in range(4)
+        ]
+
+    def _prestamo(self, usuario, libro, dias_atras, devuelto, **campos):
+        """Préstamo hecho hace `dias_atras` días con devolución a los 7 días."""
+        hoy = timezone.now().date()
+        prestamo = Prestamo.objects.create(
+            usuario=usuario, libro=libro, devuelto=devuelto,
+            fecha_devolucion=hoy - timedelta(days=dias_atras - 7), **campos
+        )
+        # fecha_prestamo es auto_now_add: se corrige después de crear
+        Prestamo.objects.filter(pk=prestamo.pk).update(fecha_prestamo=hoy - timedelta(days=dias_atras))
+        prestamo.refresh_from_db()
+        return prestamo
+
+    def test_archiva_devueltos_viejos_campo_por_campo(self):
+        viejos = [
+            self._prestamo(self.usuario, self.libros[0], 800, True, renovado=True, multa_generada=True),
+            self._prestamo(self.otro, self.libros[1], 500, True),
+            self._prestamo(self.usuario, self.libros[2], 400, True),
+        ]
+
+        # Lote de 2 para que haya más de una transacción
+        self.assertEqual(archivo.archivar_prestamos(dias=365, lote=2), 3)
+
+        self.assertFalse(Prestamo.objects.filter(pk__in=[p.pk for p in viejos]).exists())
+        for original in viejos:
+            copia = PrestamoHistorico.objects.get(prestamo_original=original.pk)
+            self.assertEqual(copia.usuario_id, original.usuario_id)
+            self.assertEqual(copia.libro_id, original.libro_id)
+            self.assertEqual(copia.fecha_prestamo, original.fecha_prestamo)
+            self.assertEqual(copia.fecha_devolucion, original.fecha_devolucion)
+            self.assertEqual(copia.renovado, original.renovado)
+            self.assertEqual(copia.multa_generada, original.multa_generada)
+
+    def test_no_toca_activos_ni_recientes(self):
+        activo_viejo = self._prestamo(self.usuario, self.libros[0], 800, False)
+        devuelto_reciente = self._prestamo(self.usuario, self.libros[1], 30, True)
+        activo_reciente = self._prestamo(self.otro, self.libros[2], 3, False)
+
+        self.assertEqual(archivo.archivar_prestamos(dias=365), 0)
+
+        self.assertEqual(
+            set(Prestamo.objects.values_list('pk', flat=True)),
+            {activo_viejo.pk, devuelto_reciente.pk, activo_reciente.pk},
+        )
+        self.assertFalse(PrestamoHistorico.objects.exists())
+        activo_viejo.refresh_from_db()
+        self.assertFalse(activo_viejo.devuelto)
+
+    def test_historial_incluye_archivados(self):
+        archivado = self._prestamo(self.usuario, self.libros[0], 800, True)
+        reciente = self._prestamo(self.usuario, self.libros[1], 3, False)
+        self._prestamo(self.otro, self.libros[2], 900, True)
+        archivo.archivar_prestamos(dias=365)
+
+        sin_historial = archivo.prestamos(usuario=self.usuario)
+        self.assertEqual([p.pk for p in sin_historial], [reciente.pk])
+
+        con_historial = archivo.prestamos(historial=True, usuario=self.usuario)
+        self.assertEqual(len(con_historial), 2)
+        # Más reciente primero; el archivado conserva su id original
+        self.assertEqual(con_historial[0].pk, reciente.pk)
+        self.assertTrue(con_historial[1].archivado)
+        self.assertEqual(con_historial[1].prestamo_original, archivado.pk)
+        self.assertEqual(con_historial[1].fecha_prestamo, archivado.fecha_prestamo)
+
+    @override_settings(PRESTAMOS_HISTORIAL_POR_PAGINA=2)
+    def test_historial_paginado_en_la_base(self):
+        archivados = [self._prestamo(self.usuario, self.libros[i], 900 - i * 100, True) for i in range(2)]
+        activos = [self._prestamo(self.otro, self.libros[2 + i], 10 - i * 5, False) for i in range(2)]
+        archivo.archivar_prestamos(dias=365)
+
+        # Conteo, unión ordenada y recortada, y carga de los préstamos de la página
+        with self.assertNumQueries(3):
+            primera = archivo.prestamos(historial=True)
+            self.assertEqual([p.pk for p in primera], [activos[1].pk, activos[0].pk])
+        segunda = archivo.prestamos(historial=True, pagina=2)
+        self.assertEqual([p.prestamo_original for p in segunda], [archivados[1].pk, archivados[0].pk])
+        self.assertFalse(segunda.has_next())
+
+        self.client.force_login(Usuario.objects.create_user('admin1', password='clave', rol='administrador'))
+        with self.settings(STORAGES=SIN_MANIFIESTO):
+            response = self.client.get(reverse('admin_dashboard_section', args=['prestamos']), {'historial': 1, 'pagina': 2})
+        self.assertContains(response, "2 de 2")
+        self.assertContains(response, self.libros[0].titulo)
+
+
+# ---------------------------------------
+# Recordatorios por correo
+# ---------------------------------------
+class CorreoQueRechaza(locmem.EmailBackend):
+    """Como locmem, pero el servidor rechaza los destinatarios de @rechazado.test."""
+
+    def send_messages(self, messages):
+        for mensaje in messages:
+            if any(destino.endswith('@rechazado.test') for destino in mensaje.to):
+                raise SMTPRecipientsRefused({destino: (550, b'No existe') for destino in mensaje.to})
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='biblioteca.tests.CorreoQueRechaza', RECORDATORIOS_DIAS=2)
+class RecordatoriosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        hoy = timezone.now().date()
+        cls.alumno = Usuario.objects.create_user('alumno1', 'alumno1@ejemplo.test', 'clave', rol='alumno')
+        # Sin préstamos salvo en el test del destinatario rechazado
+        cls.rechazado = Usuario.objects.create_user('alumno2', 'alumno2@rechazado.test', 'clave', rol='alumno')
+        cls.profesor = Usuario.objects.create_user('profesor1', 'profesor1@ejemplo.test', 'clave', rol='profesor')
+        libros = [
+            Libro.objects.create(titulo=titulo, autor="Autor", isbn=f"978000000000{i}")
+            for i, titulo in enumerate(["Rayuela", "Ficciones", "Pedro Páramo", "El túnel"])
+        ]
+        cls.vencido = Prestamo.objects.create(usuario=cls.alumno, libro=libros[0], fecha_devolucion=hoy - timedelta(days=3))
+        cls.por_vencer = Prestamo.objects.create(usuario=cls.alumno, libro=libros[1], fecha_devolucion=hoy + timedelta(days=1))
+        Prestamo.objects.create(usuario=cls.alumno, libro=libros[2], fecha_devolucion=hoy + timedelta(days=20))
+        Prestamo.objects.create(usuario=cls.profesor, libro=libros[3], fecha_devolucion=hoy + timedelta(days=2))
+
+    def test_un_resumen_por_usuario(self):
+        self.assertEqual(recordatorios.enviar_recordatorios(), (2, 3, 0))
+
+        self.assertEqual(len(mail.outbox), 2)
+        correo = next(m for m in mail.outbox if m.to == ['alumno1@ejemplo.test'])
+        cuerpo = correo.body
+        # Vencidos primero, luego los próximos a vencer; los lejanos no aparecen
+        self.assertLess(cuerpo.index("Préstamos vencidos"), cuerpo.index("Rayuela"))
+        self.assertLess(cuerpo.index("Rayuela"), cuerpo.index("Préstamos próximos a vencer"))
+        self.assertLess(cuerpo.index("Préstamos próximos a vencer"), cuerpo.index("Ficciones"))
+        self.assertNotIn("Pedro Páramo", cuerpo)
+        self.assertEqual(Recordatorio.objects.count(), 3)
+
+    def test_volver_a_ejecutar_no_reenvia(self):
+        recordatorios.enviar_recordatorios()
+        self.assertEqual(recordatorios.enviar_recordatorios(), (0, 0, 0))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_renovacion_genera_un_aviso_nuevo(self):
+        recordatorios.enviar_recordatorios()
+        Prestamo.objects.filter(pk=self.por_vencer.pk).update(
+            fecha_devolucion=self.por_vencer.fecha_devolucion + timedelta(days=7), renovado=True
+        )
+        mail.outbox.clear()
+
+        self.assertEqual(recordatorios.enviar_recordatorios(dias=10), (1, 1, 0))
+        self.assertEqual(mail.outbox[0].to, ['alumno1@ejemplo.test'])
+        self.assertIn("Ficciones", mail.outbox[0].body)
+        self.assertNotIn("Rayuela", mail.outbox[0].body)
+
+    def test_simular_no_envia_ni_registra(self):
+        call_command('enviar_recordatorios', '--simular', stdout=StringIO())
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(Recordatorio.objects.exists())
+
+    def test_destinatario_rechazado_no_frena_a_los_demas(self):
+        # El rechazado va entre los dos usuarios válidos (orden por id)
+        Prestamo.objects.create(usuario=self.rechazado, libro=self.vencido.libro, fecha_devolucion=timezone.now().date())
+
+        with self.assertLogs('biblioteca.recordatorios', 'ERROR'):
+            self.assertEqual(recordatorios.enviar_recordatorios(lote=1), (2, 3, 1))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['alumno1@ejemplo.test', 'profesor1@ejemplo.test'])
+        self.assertFalse(Recordatorio.objects.filter(prestamo__usuario=self.rechazado).exists())
+
+        # Corregida la dirección, la siguiente ejecución solo le escribe a ese usuario
+        Usuario.objects.filter(pk=self.rechazado.pk).update(email='alumno2@ejemplo.test')
+        self.assertEqual(recordatorios.enviar_recordatorios(), (1, 1, 0))
+
+
+# ---------------------------------------
+# Auditoría en diferido
+# ---------------------------------------
+@override_settings(AUDITORIA_LOTE=1, STORAGES=SIN_MANIFIESTO)
+class AuditoriaTests(TestCase):
+    def setUp(self):
+        self.addCleanup(auditoria._pendientes.clear)
+        self.addCleanup(setattr, auditoria, '_en_falla', False)
+        self.bibliotecario = Usuario.objects.create_user('biblio1', password='clave', rol='bibliotecario')
+        self.alumno = alumno = Usuario.objects.create_user('alumno1', password='clave', rol='alumno')
+        self.libro = libro = Libro.objects.create(titulo="Rayuela", autor="Cortázar", isbn="9780000000001")
+        self.prestamo = Prestamo.objects.create(
+            usuario=alumno, libro=libro, fecha_devolucion=timezone.now().date() - timedelta(days=3)
+        )
+
+    def test_reserva(self):
+        Libro.objects.filter(pk=self.libro.pk).update(disponible=False)
+        self.client.force_login(self.alumno)
+        self.client.post(reverse('reservar_libro', args=[self.libro.pk]))
+
+        evento = EventoAuditoria.objects.get()
+        self.assertEqual(
+            (evento.accion, evento.actor_id, evento.usuario_id, evento.libro_id, evento.id_reserva),
+            ('reserva', self.alumno.pk, self.alumno.pk, self.libro.pk, self.alumno.reserva_set.get().pk),
+        )
+
+    def test_renovacion(self):
+        self.client.force_login(self.alumno)
+        self.client.get(reverse('renovar_prestamo', args=[self.prestamo.pk]))
+
+        self.prestamo.refresh_from_db()
+        evento = EventoAuditoria.objects.get()
+        self.assertEqual(
+            (evento.accion, evento.actor_id, evento.usuario_id, evento.libro_id, evento.id_prestamo),
+            ('renovacion', self.alumno.pk, self.alumno.pk, self.libro.pk, self.prestamo.pk),
+        )
+        self.assertIn(str(self.prestamo.fecha_devolucion), evento.detalle)
+
+    def test_pago_multa(self):
+        self.client.force_login(self.bibliotecario)
+        response = self.client.get(reverse('pagar_multa', args=[self.prestamo.pk]), follow=True)
+
+        evento = EventoAuditoria.objects.get()
+        self.assertEqual(
+            (evento.accion, evento.actor_id, evento.usuario_id, evento.libro_id, evento.id_prestamo, evento.monto),
+            ('pago_multa', self.bibliotecario.pk, self.alumno.pk, self.libro.pk, self.prestamo.pk, 300),
+        )
+        self.assertTrue(evento.codigo_pago)
+        self.assertIn(evento.codigo_pago, str(list(response.context['messages'])[0]))
+
+    def test_eliminacion_usuario(self):
+        administrador = Usuario.objects.create_user('admin1', password='clave', rol='administrador')
+        self.client.force_login(administrador)
+        self.client.get(reverse('eliminar_usuario', args=[self.alumno.pk]))
+
+        self.assertFalse(Usuario.objects.filter(pk=self.alumno.pk).exists())
+        evento = EventoAuditoria.objects.get()
+        self.assertEqual(
+            (evento.accion, evento.actor_id, evento.usuario_id, evento.detalle),
+            ('eliminacion_usuario', administrador.pk, self.alumno.pk, 'alumno1 (Alumno)'),
+        )
+
+    @override_settings(AUDITORIA_MAX_PENDIENTES=3)
+    def test_sin_base_no_reintenta_en_cada_request_y_acota_el_buffer(self):
+        with mock.patch.object(EventoAuditoria.objects, 'bulk_create', side_effect=DatabaseError("caída")) as insertar, \
+                self.assertLogs('biblioteca.auditoria', 'ERROR') as logs:
+            for i in range(5):
+                auditoria.registrar('reserva', detalle=str(i))
+
+        # Solo el primer registro intentó escribir; el resto espera al temporizador
+        self.assertEqual(insertar.call_count, 1)
+        self.assertEqual([e.detalle for e in auditoria._pendientes], ['2', '3', '4'])
+        self.assertTrue(any("se descartan" in linea for linea in logs.output))
+
+    def test_error_al_volcar_no_hace_fallar_el_pago(self):
+        self.client.force_login(self.bibliotecario)
+        with mock.patch.object(EventoAuditoria.objects, 'bulk_create', side_effect=DatabaseError("caída")), \
+                self.assertLogs('biblioteca.auditoria', 'ERROR'):
+            response = self.client.post(reverse('pagar_multa', args=[self.prestamo.pk]), follow=True)
+
+        self.assertEqual(response.status_code, 200)
+        mensaje = str(list(response.context['messages'])[0])
+        self.prestamo.refresh_from_db()
+        self.assertTrue(self.prestamo.multa_generada)
+
+        # El evento sigue en el buffer con el código que vio el bibliotecario
+        self.assertEqual(len(auditoria._pendientes), 1)
+        codigo = auditoria._pendientes[0].codigo_pago
+        self.assertIn(codigo, mensaje)
+
+        auditoria.volcar()
+        self.assertEqual(auditoria._pendientes, [])
+        self.assertEqual(EventoAuditoria.objects.get().codigo_pago, codigo)
+
+
+# ---------------------------------------
+# Autocompletado de libros
+# ---------------------------------------
+class AutocompletarTests(TestCase):
+    def setUp(self):
+        # Índice propio por test; las señales usan el del módulo
+        parche = mock.patch.object(autocompletar, 'indice', autocompletar.IndicePrefijos())
+        self.indice = parche.start()
+        self.addCleanup(parche.stop)
+
+    def _ids(self, texto):
+        return [libro['id'] for libro in self.indice.sugerencias(texto)]
+
+    def test_normalizar_quita_tildes_y_mayusculas(self):
+        self.assertEqual(autocompletar.normalizar('  Cien AÑOS de Soledad '), 'cien anos de soledad')
+        self.assertEqual(autocompletar.normalizar('Cortázar'), 'cortazar')
+        self.assertEqual(autocompletar.normalizar(None), '')
+
+    def test_claves_por_sufijo_omiten_palabras_cortas(self):
+        self.assertEqual(
+            autocompletar._claves('Cien años de soledad', 'García Márquez'),
+            {'cien anos de soledad', 'anos de soledad', 'soledad', 'garcia marquez', 'marquez'},
+        )
+        # La primera palabra siempre es clave aunque sea corta
+        self.assertIn('el tunel', autocompletar._claves('El túnel', 'Sabato'))
+
+    def test_busca_por_palabra_sin_tildes(self):
+        libro = Libro.objects.create(titulo="Cien años de soledad", autor="García Márquez", isbn="9780000000001")
+        Libro.objects.create(titulo="Rayuela", autor="Cortázar", isbn="9780000000002")
+        self.indice.construir()
+
+        self.assertEqual(self._ids('SOLE'), [libro.pk])
+        self.assertEqual(self._ids('garcía'), [libro.pk])
+        self.assertEqual(self._ids('de sol'), [])  # 'de' no abre clave
+
+    def test_senales_mantienen_el_indice(self):
+        libro = Libro.objects.create(titulo="Rayuela", autor="Cortázar", isbn="9780000000001")
+        self.indice.construir()
+
+        libro.titulo = "Bestiario"
+        libro.disponible = False
+        libro.save()
+        self.assertEqual(self._ids('rayu'), [])
+        self.assertEqual(self.indice.sugerencias('besti')[0]['disponible'], False)
+
+        nuevo = Libro.objects.create(titulo="Ficciones", autor="Borges", isbn="9780000000002")
+        self.assertEqual(self._ids('borg'), [nuevo.pk])
+
+        libro.delete()
+        self.assertEqual(self._ids('besti'), [])
+        self.assertEqual(self._ids('cort'), [])
+
+    def test_cambio_durante_construir_se_reaplica(self):
+        libro = Libro.objects.create(titulo="Rayuela", autor="Cortázar", isbn="9780000000001")
+        claves = autocompletar._claves
+        guardado = []
+
+        def claves_con_cambio(titulo, autor):
+            # Se guarda justo después de que construir() leyó las filas
+            if not guardado:
+                guardado.append(True)
+                libro.titulo = "Bestiario"
+                libro.save()
+            return claves(titulo, autor)
+
+        with mock.patch.object(autocompletar, '_claves', side_effect=claves_con_cambio):
+            self.indice.construir()
+
+        self.assertEqual(self._ids('rayu'), [])
+        self.assertEqual(self._ids('besti'), [libro.pk])
+        self.assertEqual(self._ids('cort'), [libro.pk])
+
+
+# ---------------------------------------
+# Resúmenes de estadísticas
+# ---------------------------------------
+class EstadisticasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alumno = Usuario.objects.create_user('alumno1', password='clave', rol='alumno')
+        cls.libro = Libro.objects.create(titulo="Rayuela", autor="Cortázar", isbn="9780000000001")
+
+    def _prestamo(self, **campos):
+        return Prestamo.objects.create(
+            usuario=self.alumno, libro=self.libro, fecha_devolucion=timezone.now().date(), **campos
+        )
+
+    def _total_prestamos(self):
+        return sum(ResumenPrestamosDia.objects.values_list('cantidad', flat=True))
+
+    def test_id_confirmado_tarde_no_se_saltea(self):
+        base = self._prestamo().pk
+        estadisticas.actualizar_estadisticas()
+        self.assertEqual(self._total_prestamos(), 1)
+
+        # base + 1 queda "en vuelo": se confirma después de la siguiente ejecución
+        self._prestamo(pk=base + 2)
+        estadisticas.actualizar_estadisticas()
+        self._prestamo(pk=base + 1)
+        estadisticas.actualizar_estadisticas()
+
+        self.assertEqual(self._total_prestamos(), 3)
+        estadisticas.actualizar_estadisticas()
+        self.assertEqual(self._total_prestamos(), 3)
+
+    def test_foto_de_mora_vuelve_a_cero(self):
+        prestamo = self._prestamo()
+        Prestamo.objects.filter(pk=prestamo.pk).update(fecha_devolucion=timezone.now().date() - timedelta(days=2))
+        estadisticas.actualizar_estadisticas()
+        fila = ResumenMoraDia.objects.get(rol='alumno')
+        self.assertEqual((fila.activos, fila.vencidos), (1, 1))
+
+        Prestamo.objects.filter(pk=prestamo.pk).update(devuelto=True)
+        estadisticas.actualizar_estadisticas()
+        fila = ResumenMoraDia.objects.get(rol='alumno')
+        self.assertEqual((fila.activos, fila.vencidos), (0, 0))
+        self.assertEqual(ResumenMoraDia.objects.count(), len(Usuario.ROLES))
+
+
+# ---------------------------------------
+# Recomendaciones por similitud
+# ---------------------------------------
+class RecomendacionesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuarios = [
+            Usuario.objects.create_user(f'alumno{i}', password='clave', rol='alumno') for i in range(3)
+        ]
+        cls.libros = [
+            Libro.objects.create(titulo=f"Libro {i}", autor="Autor", isbn=f"978000000000{i}")
+            for i in range(4)
+        ]
+
+    def _prestar(self, usuario, *libros):
+        for libro in libros:
+            Prestamo.objects.create(usuario=usuario, libro=libro, fecha_devolucion=timezone.now().date())
+
+    def _similares(self):
+        return {
+            (fila.libro_id, fila.recomendado_id): round(fila.puntaje, 4)
+            for fila in LibroSimilar.objects.all()
+        }
+
+    def test_similitud_coseno_y_minimo_de_coincidencias(self):
+        # Lectores: libro 10 -> {1, 2, 3}, 20 -> {1, 2}, 30 -> {3}; el usuario 1 repite el 10
+        usuarios = np.array([1, 1, 1, 2, 2, 3, 3])
+        libros = np.array([10, 10, 20, 10, 20, 10, 30])
+
+        ids, similitud = recomendaciones.matriz_similitud(usuarios, libros, 1)
+        self.assertEqual(list(ids), [10, 20, 30])
+        self.assertAlmostEqual(similitud[0, 1], 2 / np.sqrt(6), places=5)
+        self.assertAlmostEqual(similitud[0, 2], 1 / np.sqrt(3), places=5)
+        self.assertEqual(similitud[1, 2], 0)
+        self.assertEqual(similitud.diagonal().sum(), 0)
+
+        _, similitud = recomendaciones.matriz_similitud(usuarios, libros, 2)
+        self.assertAlmostEqual(similitud[0, 1], 2 / np.sqrt(6), places=5)
+        self.assertEqual(similitud[0, 2], 0)  # un solo lector en común
+
+    def test_excluye_libros_ya_prestados_aunque_esten_archivados(self):
+        a, b, c, d = self.libros
+        for libro, recomendado, puntaje in [(a, b, 0.9), (a, c, 0.8), (c, d, 0.5), (c, a, 0.8)]:
+            LibroSimilar.objects.create(libro=libro, recomendado=recomendado, puntaje=puntaje)
+        usuario = self.usuarios[0]
+        self._prestar(usuario, a)
+        PrestamoHistorico.objects.create(
+            prestamo_original=9999, usuario=usuario, libro=c, fecha_prestamo=timezone.now().date()
+        )
+
+        self.assertEqual(list(recomendaciones.recomendaciones_para(usuario)), [b, d])
+
+    def test_incremental_reescribe_los_vecinos(self):
+        a, b, c, _ = self.libros
+        u1, u2, _ = self.usuarios
+        self._prestar(u1, a, b)
+        self._prestar(u2, a, b)
+        recomendaciones.calcular_recomendaciones()
+        self.assertEqual(set(self._similares()), {(a.pk, b.pk), (b.pk, a.pk)})
+
+        # Solo c tiene préstamos nuevos, pero a y b ganan a c como vecino
+        self._prestar(u1, c)
+        self._prestar(u2, c)
+        afectados, _ = recomendaciones.calcular_recomendaciones()
+        self.assertEqual(afectados, 3)
+        incremental = self._similares()
+        self.assertIn((a.pk, c.pk), incremental)
+        self.assertIn((b.pk, c.pk), incremental)
+
+        recomendaciones.calcular_recomendaciones(completo=True)
+        self.assertEqual(incremental, self._similares())
+
+    def test_prestamo_borrado_fuerza_calculo_completo(self):
+        a, b, _, _ = self.libros
+        u1, u2, _ = self.usuarios
+        self._prestar(u1, a, b)
+        self._prestar(u2, a, b)
+        recomendaciones.calcular_recomendaciones()
+        self.assertEqual(LibroSimilar.objects.count(), 2)
+
+        # Sin préstamos nuevos, pero a y b quedan con un solo lector en común
+        Prestamo.objects.filter(usuario=u2, libro=b).delete()
+        recomendaciones.calcular_recomendaciones()
+        self.assertEqual(LibroSimilar.objects.count(), 0)
+
+
+# ---------------------------------------
+# Lecturas desde réplicas
+# ---------------------------------------
+@override_settings(STORAGES=SIN_MANIFIESTO)
+class ReplicasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bibliotecario = Usuario.objects.create_user('biblio1', password='clave', rol='bibliotecario')
+        alumno = Usuario.objects.create_user('alumno1', password='clave', rol='alumno')
+        libro = Libro.objects.create(titulo="Rayuela", autor="Cortázar", isbn="9780000000001")
+        cls.prestamo = Prestamo.objects.create(
+            usuario=alumno, libro=libro, fecha_devolucion=timezone.now().date() - timedelta(days=3)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.bibliotecario)
+        self.addCleanup(routers._caidas.clear)
+        self.addCleanup(auditoria._pendientes.clear)
+
+        # Réplica espejo: comparte la conexión (y la transacción del test) con la primaria
+        connections['espejo'] = connections['default']
+        self.addCleanup(connections.__delitem__, 'espejo')
+        # Réplica caída: el archivo no existe y se abre en modo solo lectura
+        self._alias('caida', 'file:/no/existe/replica.sqlite3?mode=ro')
+        # Réplica que conecta pero no tiene las tablas
+        self._alias('vacia', 'file:replica_vacia?mode=memory&cache=shared')
+
+        # Alias devueltos por el router durante cada request
+        self.leidos = []
+        original = routers.alias_lectura
+
+        def alias_lectura():
+            alias = original()
+            self.leidos.append(alias)
+            return alias
+        patcher = mock.patch.object(routers, 'alias_lectura', alias_lectura)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _alias(self, alias, nombre):
+        datos = {**connections['default'].settings_dict, 'NAME': nombre}
+        connections[alias] = conexion = connections['default'].__class__(datos, alias)
+        self.addCleanup(connections.__delitem__, alias)
+        self.addCleanup(conexion.close)
+
+    def _dashboard(self):
+        self.leidos.clear()
+        response = self.client.get(reverse('dashboard_bibliotecario'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Rayuela")
+        return set(self.leidos)
+
+    def test_lee_de_la_replica(self):
+        with self.settings(REPLICAS=['espejo']):
+            self.assertIn('espejo', self._dashboard())
+
+    def test_replica_que_no_conecta_usa_la_primaria(self):
+        with self.settings(REPLICAS=['caida']):
+            self.assertEqual(self._dashboard(), {'default'})
+        self.assertIn('caida', routers._caidas)
+
+    def test_replica_que_falla_al_consultar_repite_en_la_primaria(self):
+        with self.settings(REPLICAS=['vacia']):
+            self.assertEqual(self._dashboard() - {'vacia'}, {'default'})
+            self.assertIn('vacia', routers._caidas)
+            # Mientras está marcada caída ni siquiera se intenta
+            self.assertEqual(self._dashboard(), {'default'})
+
+    def test_error_de_la_primaria_no_marca_caida_la_replica(self):
+        llamadas = []
+
+        @routers.lectura_replica
+        def vista(request):
+            llamadas.append(routers.alias_lectura())
+            with connections['default'].cursor() as cursor:
+                cursor.execute('SELECT * FROM tabla_que_no_existe')
+
+        # Sin pasar por ReplicaMiddleware: el login de setUp dejó fijada la primaria
+        tokens = routers.iniciar_request(False)
+        self.addCleanup(routers.terminar_request, tokens)
+        with self.settings(REPLICAS=['vacia']):
+            with self.assertRaises(DatabaseError):
+                vista(RequestFactory().get('/'))
+        self.assertEqual(llamadas, ['vacia'])
+        self.assertNotIn('vacia', routers._caidas)
+
+    def test_escritura_fija_la_primaria_en_el_request_siguiente(self):
+        with self.settings(REPLICAS=['espejo']):
+            response = self.client.get(reverse('pagar_multa', args=[self.prestamo.pk]))
+            self.assertEqual(response.status_code, 302)
+            self.assertIn(ReplicaMiddleware.COOKIE, response.cookies)
+
+            self.assertEqual(self._dashboard(), {'default'})
+
+            # Vencida la ventana vuelve a leer de la réplica
+            del self.client.cookies[ReplicaMiddleware.COOKIE]
+            self.assertIn('espejo', self._dashboard())
+
+
+# ---------------------------------------
+# Visor de perfiles
+# ---------------------------------------
+@override_settings(STORAGES=SIN_MANIFIESTO)
+class PerfiladorTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        configuracion = self.settings(PERFILADOR_DIR=directorio.name)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        self.client.force_login(Usuario.objects.create_user('admin1', password='clave', rol='administrador'))
+
+    def test_arbol_plano_con_desplazamientos(self):
+        arbol = perfilador.arbol({'a;b': 3, 'a;c': 1})
+        self.assertEqual(arbol['muestras'], 4)
+        self.assertEqual(arbol['niveles'], 3)
+        self.assertEqual(
+            [(f['nombre'], f['profundidad'], f['inicio'], f['ancho']) for f in arbol['filas']],
+            [('vista', 0, 0, 100), ('a', 1, 0, 100), ('b', 2, 0, 75), ('c', 2, 75, 25)],
+        )
+
+    def test_muestra_pilas_profundas(self):
+        pila = ';'.join(f"funcion_{i} (modulo.py:{i})" for i in range(300))
+        nombre = perfilador.guardar({
+            'fecha': timezone.now().isoformat(), 'url_name': 'profundo', 'ruta': '/profundo/',
+            'metodo': 'GET', 'usuario': 'admin1', 'estado': 200, 'duracion_ms': 10,
+            'intervalo_ms': 1, 'pilas': {pila: 5}, 'consultas': [],
+        })
+
+        response = self.client.get(reverse('perfil_detalle', args=[nombre]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'funcion_299 (modulo.py:299)', count=3)
+
+    def test_excepcion_manejada_guarda_su_estado(self):
+        response = self.client.get(reverse('perfil_detalle', args=['no-existe.json']), {'perfilar': '1'})
+        self.assertEqual(response.status_code, 404)
+        [perfil] = perfilador.listar()
+        self.assertEqual((perfil['url_name'], perfil['estado']), ('perfil_detalle', 404))
@@ -20,6 +20,7 @@ urlpatterns = [
     # -----------------------------
     # Funciones de usuario
     # -----------------------------
+    path('libro/autocompletar/', views.autocompletar_libros, name='autocompletar_libros'),
     path('libro/reservar/<int:libro_id>/', views.reservar_libro, name='reservar_libro'),
     path('prestamo/renovar/<int:prestamo_id>/', views.renovar_prestamo, name='renovar_prestamo'),
 
@@ -38,4 +39,10 @@ urlpatterns = [
     # Gestión de usuarios (eliminar)
     # -----------------------------
     path('panel/usuarios/eliminar/<int:id>/', views.eliminar_usuario, name='eliminar_usuario'),
+
+    # -----------------------------
+    # Perfiles de rendimiento (staff)
+    # -----------------------------
+    path('perfiles/', views.perfiles, name='perfiles'),
+    path('perfiles/<str:nombre>/', views.perfil_detalle, name='perfil_detalle'),
 ]
@@ -2,11 +2,15 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
+from django.http import Http404, JsonResponse
 from django.views.decorators.http import require_POST
+from django.utils import timezone
 from datetime import timedelta
 import uuid
 
+from . import archivo, auditoria, autocompletar, estadisticas, perfilador, recomendaciones
 from .models import Usuario, Libro, Prestamo, Reserva
+from .routers import lectura_replica
 from .forms import LoginForm, LibroForm, CrearUsuarioForm, EditarUsuarioForm
 
 # ---------------------------------------
@@ -57,6 +61,7 @@ def logout_usuario(request):
 # Dashboards según rol
 # ---------------------------------------
 @login_required
+@lectura_replica
 def dashboard_bibliotecario(request):
     if request.user.rol != 'bibliotecario':
         messages.warning(request, "No tienes permiso para acceder a esta página.")
@@ -66,40 +71,62 @@ def dashboard_bibliotecario(request):
         'libros_disponibles': Libro.objects.filter(disponible=True),
         'libros_prestados': Libro.objects.filter(disponible=False),
         'prestamos': Prestamo.objects.all(),
-        'morosos': [p for p in Prestamo.objects.all() if p.dias_mora() > 0],
+        'morosos': Prestamo.objects.filter(
+            devuelto=False, fecha_devolucion__lt=timezone.now().date()
+        ).select_related('usuario', 'libro'),
         'usuarios': Usuario.objects.filter(rol__in=['alumno', 'profesor'])
     }
     return render(request, 'biblioteca/dashboard_bibliotecario.html', context)
 
 
 @login_required
+@lectura_replica
 def dashboard_alumno(request):
     if request.user.rol != 'alumno':
         messages.warning(request, "No tienes permiso para acceder a esta página.")
         return redirect('home')
 
+    # ?historial=1 incluye también los préstamos archivados
+    historial = request.GET.get('historial') == '1'
     context = {
         'libros_disponibles': Libro.objects.filter(disponible=True),
         'reservas_usuario': Reserva.objects.filter(usuario=request.user),
-        'prestamos_usuario': Prestamo.objects.filter(usuario=request.user),
+        'prestamos_usuario': archivo.prestamos(historial, request.GET.get('pagina'), usuario=request.user),
+        'historial': historial,
+        'recomendados': recomendaciones.recomendaciones_para(request.user),
     }
     return render(request, 'biblioteca/dashboard_alumno.html', context)
 
 
 @login_required
+@lectura_replica
 def dashboard_profesor(request):
     if request.user.rol != 'profesor':
         messages.warning(request, "No tienes permiso para acceder a esta página.")
         return redirect('home')
 
+    # ?historial=1 incluye también los préstamos archivados
+    historial = request.GET.get('historial') == '1'
     context = {
         'libros_disponibles': Libro.objects.filter(disponible=True),
         'reservas_usuario': Reserva.objects.filter(usuario=request.user),
-        'prestamos_usuario': Prestamo.objects.filter(usuario=request.user),
+        'prestamos_usuario': archivo.prestamos(historial, request.GET.get('pagina'), usuario=request.user),
+        'historial': historial,
+        'recomendados': recomendaciones.recomendaciones_para(request.user),
     }
     return render(request, 'biblioteca/dashboard_profesor.html', context)
 
 
+# ---------------------------------------
+# Autocompletado de títulos y autores
+# ---------------------------------------
+@login_required
+def autocompletar_libros(request):
+    # Responde desde el índice en memoria, sin consultar la base de datos
+    sugerencias = autocompletar.indice.sugerencias(request.GET.get('q', ''))
+    return JsonResponse({'resultados': sugerencias})
+
+
 # ---------------------------------------
 # Funciones de usuario
 # ---------------------------------------
@@ -108,7 +135,8 @@ def dashboard_profesor(request):
 def reservar_libro(request, libro_id):
     libro = get_object_or_404(Libro, id=libro_id)
     if not libro.disponible:
-        Reserva.objects.create(usuario=request.user, libro=libro)
+        reserva = Reserva.objects.create(usuario=request.user, libro=libro)
+        auditoria.registrar('reserva', actor=request.user, usuario=request.user, libro=libro, reserva=reserva)
         messages.success(request, f"Has reservado el libro '{libro.titulo}'")
     else:
         messages.warning(request, f"El libro '{libro.titulo}' está disponible, no es necesario reservar")
@@ -126,6 +154,10 @@ def renovar_prestamo(request, prestamo_id):
         prestamo.fecha_devolucion += timedelta(days=7)
         prestamo.renovado = True
         prestamo.save()
+        auditoria.registrar(
+            'renovacion', actor=request.user, usuario=prestamo.usuario, libro=prestamo.libro, prestamo=prestamo,
+            detalle=f"Nueva fecha de devolución: {prestamo.fecha_devolucion}"
+        )
         messages.success(request, f"Préstamo del libro '{prestamo.libro.titulo}' renovado 7 días más")
     else:
         messages.warning(request, "Este préstamo ya fue renovado una vez")
@@ -143,6 +175,10 @@ def pagar_multa(request, prestamo_id):
         codigo_pago = str(uuid.uuid4()).split('-')[0].upper()
         prestamo.multa_generada = True
         prestamo.save()
+        auditoria.registrar(
+            'pago_multa', actor=request.user, usuario=prestamo.usuario, libro=prestamo.libro, prestamo=prestamo,
+            codigo_pago=codigo_pago, monto=prestamo.monto_multa()
+        )
         messages.success(
             request,
             f"Código de pago para '{prestamo.usuario.username}': {codigo_pago} - Monto: {prestamo.monto_multa()} pesos"
@@ -156,6 +192,7 @@ def pagar_multa(request, prestamo_id):
 # Panel de administrador unificado
 # ---------------------------------------
 @login_required
+@lectura_replica
 def admin_dashboard(request, section=None):
     if request.user.rol != 'administrador':
         messages.warning(request, "No tienes permiso para acceder a esta página.")
@@ -222,7 +259,8 @@ def admin_dashboard(request, section=None):
 
     # Sección de préstamos
     elif active_section == 'prestamos':
-        context['prestamos'] = Prestamo.objects.all()
+        context['historial'] = request.GET.get('historial') == '1'
+        context['prestamos'] = archivo.prestamos(context['historial'], request.GET.get('pagina'))
 
     # Sección de reservas
     elif active_section == 'reservas':
@@ -235,6 +273,7 @@ def admin_dashboard(request, section=None):
             'libros': Libro.objects.all(),
             'prestamos': Prestamo.objects.all(),
             'reservas': Reserva.objects.all(),
+            'estadisticas': estadisticas.resumen_panel(),
         })
 
     return render(request, 'biblioteca/admin.html', context)
@@ -252,7 +291,45 @@ def eliminar_usuario(request, id):
     if usuario.rol == 'administrador':
         messages.error(request, "No puedes eliminar a otro administrador.")
     else:
+        # Se registra antes de borrar, mientras el usuario conserva su id
+        auditoria.registrar(
+            'eliminacion_usuario', actor=request.user, usuario=usuario,
+            detalle=f"{usuario.username} ({usuario.get_rol_display()})"
+        )
         usuario.delete()
         messages.success(request, f"Usuario '{usuario.username}' eliminado correctamente.")
 
     return redirect('admin_dashboard_section', section='usuarios')
+
+
+# ---------------------------------------
+# Visor de perfiles de rendimiento (staff)
+# ---------------------------------------
+@login_required
+def perfiles(request):
+    if not perfilador.puede_ver(request.user):
+        messages.warning(request, "No tienes permiso para acceder a esta página.")
+        return redirect('home')
+
+    return render(request, 'biblioteca/perfiles.html', {'perfiles': perfilador.listar()})
+
+
+@login_required
+def perfil_detalle(request, nombre):
+    if not perfilador.puede_ver(request.user):
+        messages.warning(request, "No tienes permiso para acceder a esta página.")
+        return redirect('home')
+
+    perfil = perfilador.cargar(nombre)
+    if perfil is None:
+        raise Http404("El perfil no existe o ya fue descartado")
+
+    consultas = sorted(perfil['consultas'], key=lambda c: -c['ms'])
+    context = {
+        'nombre': nombre,
+        'perfil': perfil,
+        'arbol': perfilador.arbol(perfil['pilas']),
+        'consultas': consultas,
+        'sql_ms': round(sum(c['ms'] for c in consultas), 2),
+    }
+    return render(request, 'biblioteca/perfil_detalle.html', context)
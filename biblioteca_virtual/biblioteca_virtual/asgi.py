@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biblioteca_virtual.settings')
 
 application = get_asgi_application()
+
+# El índice de autocompletado se carga al arrancar y no en el primer request
+from biblioteca.autocompletar import indice  # noqa: E402
+
+indice.reconstruir_en_segundo_plano()
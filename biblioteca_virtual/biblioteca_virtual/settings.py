@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,12 +44,22 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Sirve los estáticos con nombre hasheado, cabeceras de caché de larga
+    # duración y las variantes .gz/.br generadas por collectstatic
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Fija las lecturas a la primaria unos segundos después de escribir
+    'biblioteca.middleware.ReplicaMiddleware',
+    # Comprime las respuestas HTML (dashboards) según Accept-Encoding
+    'django.middleware.gzip.GZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'biblioteca.middleware.AuditoriaMiddleware',
+    # Debe ir al final: perfila solo la vista (ver PERFILADOR_*)
+    'biblioteca.middleware.PerfiladorMiddleware',
 ]
 
 ROOT_URLCONF = 'biblioteca_virtual.urls'
@@ -84,6 +95,26 @@ DATABASES = {
     }
 }
 
+# Réplicas de solo lectura (opcional). Las vistas marcadas con @lectura_replica
+# leen de ellas; las escrituras siempre van a 'default'. Para probar en local
+# con SQLite se puede usar una copia de la base:
+#   sqlite3 db.sqlite3 ".backup replica.sqlite3"
+#   BIBLIOTECA_REPLICAS=replica.sqlite3 python manage.py runserver
+# Con PostgreSQL se agregan aquí los alias de las réplicas reales.
+for i, nombre in enumerate(filter(None, os.environ.get('BIBLIOTECA_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{i}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        # Solo lectura: si el archivo no existe falla al conectar en vez de
+        # crear una base vacía
+        'NAME': f"file:{BASE_DIR / nombre.strip()}?mode=ro",
+        'TEST': {'MIRROR': 'default'},
+    }
+
+REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['biblioteca.routers.RouterReplicas']
+REPLICA_VENTANA_ESCRITURA = 5  # segundos
+REPLICA_REINTENTO = 30  # segundos sin usar una réplica que no respondió
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -121,6 +152,22 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Destino de `manage.py collectstatic` (no se versiona)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Bootstrap va copiado en biblioteca/static/vendor, así la biblioteca funciona
+# sin acceso a la CDN. En collectstatic cada archivo recibe un nombre con el
+# hash de su contenido (p. ej. style.3f2a9c.css) y se precomprime en .gz y .br,
+# por lo que WhiteNoise lo sirve con Cache-Control "immutable" de largo plazo.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -132,3 +179,51 @@ AUTH_USER_MODEL = 'biblioteca.Usuario'
 
 LOGOUT_REDIRECT_URL = 'home'
 
+# Archivado de préstamos (manage.py archivar_prestamos): los devueltos hace más
+# de PRESTAMOS_ARCHIVO_DIAS días pasan a PrestamoHistorico, de a lotes
+PRESTAMOS_ARCHIVO_DIAS = 365
+PRESTAMOS_ARCHIVO_LOTE = 1000
+# Con ?historial=1 los préstamos (activos + archivados) se muestran paginados
+PRESTAMOS_HISTORIAL_POR_PAGINA = 50
+
+# Correo saliente. En desarrollo apunta a un servidor SMTP local de depuración
+# que solo muestra los mensajes, p. ej.: python -m aiosmtpd -n -l localhost:1025
+EMAIL_HOST = 'localhost'
+EMAIL_PORT = 1025
+DEFAULT_FROM_EMAIL = 'Biblioteca Virtual <biblioteca@localhost>'
+
+# Recordatorios (manage.py enviar_recordatorios): avisa los préstamos que vencen
+# dentro de RECORDATORIOS_DIAS días y los vencidos, de a RECORDATORIOS_LOTE correos
+RECORDATORIOS_DIAS = 2
+RECORDATORIOS_LOTE = 500
+
+# Auditoría: los eventos se acumulan en memoria y se escriben con bulk_create
+# al juntar AUDITORIA_LOTE o cuando pasan AUDITORIA_INTERVALO segundos
+AUDITORIA_LOTE = 100
+AUDITORIA_INTERVALO = 5
+# Tope del buffer si la base no responde; se descartan los eventos más viejos
+AUDITORIA_MAX_PENDIENTES = 10000
+
+# Autocompletado de libros: índice de prefijos en memoria por proceso, cargado
+# al arrancar y reconstruido en segundo plano cada AUTOCOMPLETAR_TTL segundos
+# para ver cambios de otros procesos
+AUTOCOMPLETAR_LIMITE = 8
+AUTOCOMPLETAR_TTL = 300
+
+# Recomendaciones (manage.py calcular_recomendaciones): se guardan los
+# RECOMENDACIONES_TOP_K libros más similares a cada libro, ignorando pares con
+# menos de RECOMENDACIONES_MIN_COINCIDENCIAS lectores en común
+RECOMENDACIONES_TOP_K = 10
+RECOMENDACIONES_MIN_COINCIDENCIAS = 2
+RECOMENDACIONES_LIMITE = 6
+
+# Perfilador bajo demanda: el staff agrega ?perfilar=1 (o X-Perfilar: 1) y el
+# perfil (pila muestreada + SQL) queda en PERFILADOR_DIR, visible en /perfiles/.
+# PERFILADOR_MUESTREO perfila además 1 de cada N requests por nombre de URL,
+# p. ej. {'dashboard_bibliotecario': 100}
+PERFILADOR_DIR = BASE_DIR / 'perfiles'
+PERFILADOR_MAX = 50  # perfiles guardados; los más viejos se descartan
+PERFILADOR_MUESTREO = {}
+PERFILADOR_INTERVALO = 0.001  # segundos entre muestras de la pila
+PERFILADOR_UMBRAL = 0.005  # fracción mínima de muestras para mostrar una función
+
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biblioteca_virtual.settings')
 
 application = get_wsgi_application()
+
+# El índice de autocompletado se carga al arrancar y no en el primer request
+from biblioteca.autocompletar import indice  # noqa: E402
+
+indice.reconstruir_en_segundo_plano()